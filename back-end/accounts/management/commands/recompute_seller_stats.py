@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from accounts.models import Profile, Rating
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero la reputación (suma, cantidad y promedio de calificaciones) de cada perfil'
+
+    def handle(self, *args, **options):
+        # Una sola consulta agrupada con los totales reales por usuario calificado
+        totals = {
+            row['rated_user_id']: (row['total'], row['count'])
+            for row in Rating.objects.values('rated_user_id').annotate(
+                total=models.Sum('rating'), count=models.Count('id')
+            )
+        }
+        
+        fixed = []
+        for profile in Profile.objects.only('id', 'user_id', 'rating_sum', 'rating_count', 'rating_avg'):
+            rating_sum, rating_count = totals.get(profile.user_id, (0, 0))
+            rating_avg = rating_sum / rating_count if rating_count else 0.0
+            if (profile.rating_sum, profile.rating_count) != (rating_sum, rating_count) or profile.rating_avg != rating_avg:
+                profile.rating_sum = rating_sum
+                profile.rating_count = rating_count
+                profile.rating_avg = rating_avg
+                fixed.append(profile)
+        
+        with transaction.atomic():
+            Profile.objects.bulk_update(fixed, ['rating_sum', 'rating_count', 'rating_avg'], batch_size=500)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Reputación recalculada: {len(fixed)} perfiles corregidos')
+        )
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    Rating = apps.get_model('accounts', 'Rating')
+    totals = Rating.objects.values('rated_user_id').annotate(
+        total=models.Sum('rating'), count=models.Count('id')
+    )
+    for row in totals:
+        Profile.objects.filter(user_id=row['rated_user_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating_avg=row['total'] / row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_verification_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rating_avg',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, FloatField, When
+from django.db.models.functions import Cast
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.utils import timezone
@@ -64,23 +66,43 @@ class Profile(models.Model):
     location = models.CharField(max_length=100, blank=True)
     birth_date = models.DateField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
+    # Reputación como vendedor, mantenida por los signals de Rating (ver recompute_seller_stats)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0.0)
 
     def __str__(self):
         return self.user.email
 
     @property
     def average_rating(self):
-        """Calcula el promedio de las calificaciones recibidas por este usuario"""
-        ratings = self.user.received_ratings.all()
-        if ratings.exists():
-            total = sum(rating.rating for rating in ratings)
-            return round(total / ratings.count(), 1)
-        return 0.0
+        """Promedio de las calificaciones recibidas por este usuario"""
+        return round(self.rating_avg, 1)
 
     @property
     def total_ratings(self):
-        """Cuenta el total de calificaciones recibidas por este usuario"""
-        return self.user.received_ratings.count()
+        """Total de calificaciones recibidas por este usuario"""
+        return self.rating_count
+
+    @classmethod
+    def apply_rating_delta(cls, user_id, sum_delta, count_delta):
+        """
+        Actualiza la reputación de un usuario en una sola sentencia UPDATE con F().
+        El promedio se calcula con los valores nuevos dentro de la misma sentencia.
+        """
+        new_sum = F('rating_sum') + sum_delta
+        new_count = F('rating_count') + count_delta
+        cls.objects.filter(user_id=user_id).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating_avg=Case(
+                When(rating_count__gt=-count_delta, then=ExpressionWrapper(
+                    Cast(new_sum, FloatField()) / new_count, output_field=FloatField()
+                )),
+                default=0.0,
+                output_field=FloatField(),
+            ),
+        )
 
 class Rating(models.Model):
     """Modelo para calificaciones de vendedores"""
@@ -133,6 +155,32 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         except Profile.DoesNotExist:
             Profile.objects.create(user=instance)
 
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, **kwargs):
+    """Guarda el valor anterior de una calificación editada para aplicar solo la diferencia"""
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Rating.objects.filter(pk=instance.pk).values_list('rated_user_id', 'rating').first()
+        )
+
+@receiver(post_save, sender=Rating)
+def update_reputation_on_rating_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        Profile.apply_rating_delta(instance.rated_user_id, instance.rating, 1)
+        return
+    previous_user_id, previous_rating = previous
+    if previous_user_id != instance.rated_user_id:
+        Profile.apply_rating_delta(previous_user_id, -previous_rating, -1)
+        Profile.apply_rating_delta(instance.rated_user_id, instance.rating, 1)
+    elif previous_rating != instance.rating:
+        Profile.apply_rating_delta(instance.rated_user_id, instance.rating - previous_rating, 0)
+
+@receiver(post_delete, sender=Rating)
+def update_reputation_on_rating_delete(sender, instance, **kwargs):
+    Profile.apply_rating_delta(instance.rated_user_id, -instance.rating, -1)
+
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True)
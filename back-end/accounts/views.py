@@ -771,7 +771,7 @@ class PublicUserProfileView(generics.RetrieveAPIView):
     def get(self, request, user_id):
         try:
             # Obtener el usuario por ID
-            user = get_object_or_404(User, id=user_id)
+            user = get_object_or_404(User.objects.select_related('profile'), id=user_id)
             
             # Obtener datos básicos del perfil
             profile_data = {}
@@ -788,13 +788,12 @@ class PublicUserProfileView(generics.RetrieveAPIView):
                     'birth_date': user.profile.birth_date.isoformat() if user.profile.birth_date else None,
                 }
             
-            # Calcular calificaciones promedio
-            ratings = Rating.objects.filter(rated_user=user)
+            # Reputación precalculada en el perfil
             average_rating = 0
-            total_ratings = ratings.count()
-            
-            if total_ratings > 0:
-                average_rating = ratings.aggregate(avg_rating=models.Avg('rating'))['avg_rating'] or 0
+            total_ratings = 0
+            if hasattr(user, 'profile'):
+                average_rating = user.profile.rating_avg
+                total_ratings = user.profile.rating_count
             
             logger.info(f"Profile data for user {user_id}: {profile_data}")
             
@@ -0,0 +1,98 @@
+"""
+JSON rápido para la API REST y los WebSockets.
+
+Usa orjson (datetime, UUID y dataclasses nativos; Decimal como en DRF) y, si no está
+instalado, vuelve al JSONEncoder de DRF sobre la librería estándar. La salida es la misma
+que la del JSONRenderer de DRF: las fechas van en ISO 8601 con microsegundos y "Z" para
+UTC, como hace el JSONEncoder de DRF 3.16 (versiones antiguas recortaban a milisegundos).
+Lo que orjson no puede codificar (por ejemplo, enteros de más de 64 bits) pasa por el
+JSONEncoder de DRF.
+"""
+
+import datetime
+import decimal
+import json
+
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+def _default(obj):
+    """Tipos que orjson no serializa por sí mismo, con el mismo resultado que el JSONEncoder de DRF"""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__') and hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Tipo no serializable a JSON: {type(obj).__name__}')
+
+
+def dumps(data, indent=False):
+    """Codifica a bytes UTF-8"""
+    if orjson is not None:
+        # OPT_UTC_Z: fechas UTC con "Z", igual que el JSONEncoder de DRF
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, indent=2 if indent else None,
+        separators=None if indent else (',', ':')
+    ).encode('utf-8')
+
+
+def dumps_str(data):
+    """Codifica a str, para text_data de los WebSockets"""
+    return dumps(data).decode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer de DRF con orjson; mismo media type y parámetro indent"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        return dumps(data, indent=bool(indent))
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser de DRF con orjson (los cuerpos JSON deben venir en UTF-8)"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
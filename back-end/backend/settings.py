@@ -134,6 +134,22 @@ ACCOUNT_EMAIL_DOMAIN_WHITELIST = ['uoh.cl']
 
 # Configuración para Django Channels (chat)
 ASGI_APPLICATION = 'backend.asgi.application'  # Fix the ASGI application path
+# Caché: memoria local por proceso por defecto; con REDIS_URL se comparte entre procesos
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'uoh-market',
+        }
+    }
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',  # Para desarrollo
@@ -241,6 +257,16 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # JSON con orjson (ver backend/renderers.py); vuelve a la librería estándar si no está instalado
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'backend.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 12
 }
@@ -297,6 +323,61 @@ CONTENT_MODERATION_FALLBACK = True  # Usar método local como fallback
 HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN', '')  # Token para Hugging Face
 MODERATION_SERVICE = 'intelligent_ai_detection'  # IA inteligente con múltiples métodos
 
+# Planificación de revisiones según riesgo del vendedor (ver products/risk.py)
+PRODUCT_REVIEW_POLICY = {
+    'trusted_threshold': 0.3,    # Bajo este puntaje se usa la vía rápida (texto + hashes)
+    'risky_threshold': 0.7,      # Sobre este puntaje se usa análisis completo con menor prioridad
+    'trusted_min_approvals': 3,  # Aprobaciones previas mínimas para ser confiable
+    'delays': {'trusted': 5, 'standard': 30, 'risky': 60},
+}
+
+# Revisar productos vencidos dentro de las peticiones (ProductReviewMiddleware), a lo más
+# tantos por petición. Desactivar donde corre el worker review_pending_products
+PRODUCT_REVIEW_IN_REQUESTS = os.getenv('PRODUCT_REVIEW_IN_REQUESTS', 'True').lower() == 'true'
+PRODUCT_REVIEW_MAX_PER_REQUEST = int(os.getenv('PRODUCT_REVIEW_MAX_PER_REQUEST', '2'))
+
+# Ediciones consecutivas dentro de esta ventana (segundos) se agrupan en una sola re-revisión
+PRODUCT_REREVIEW_QUIET_WINDOW = int(os.getenv('PRODUCT_REREVIEW_QUIET_WINDOW', '30'))
+# Espera máxima desde la primera edición, para que ediciones continuas no posterguen la revisión
+PRODUCT_REREVIEW_MAX_WAIT = int(os.getenv('PRODUCT_REREVIEW_MAX_WAIT', '300'))
+
+# Cada cuántos segundos se reconstruye completo el índice de sugerencias de búsqueda de cada proceso
+PRODUCT_SUGGEST_REBUILD_SECONDS = int(os.getenv('PRODUCT_SUGGEST_REBUILD_SECONDS', '600'))
+
+# Cada cuántos segundos se reconstruye el índice de productos similares (recalcula los pesos IDF)
+PRODUCT_SIMILAR_REBUILD_SECONDS = int(os.getenv('PRODUCT_SIMILAR_REBUILD_SECONDS', '1800'))
+
+# Vigencia máxima de las ofertas semanales en caché (también se invalidan al cambiar precios o estados)
+WEEKLY_OFFERS_CACHE_TIMEOUT = int(os.getenv('WEEKLY_OFFERS_CACHE_TIMEOUT', '600'))
+
+# Vigencia máxima de las respuestas públicas del catálogo en caché (se invalidan con cada cambio)
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '300'))
+
+# Las vistas de productos se acumulan en memoria y se guardan en lote cada tantos segundos
+# o al acumular tantos productos pendientes
+PRODUCT_VIEWS_FLUSH_INTERVAL = int(os.getenv('PRODUCT_VIEWS_FLUSH_INTERVAL', '10'))
+PRODUCT_VIEWS_FLUSH_MAX_PENDING = int(os.getenv('PRODUCT_VIEWS_FLUSH_MAX_PENDING', '500'))
+
+# Las imágenes de un producto nuevo se escriben en paralelo con este número de hilos,
+# sin superar este total de bytes escribiéndose a la vez
+PRODUCT_IMAGE_UPLOAD_WORKERS = int(os.getenv('PRODUCT_IMAGE_UPLOAD_WORKERS', '4'))
+PRODUCT_IMAGE_UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv('PRODUCT_IMAGE_UPLOAD_MAX_INFLIGHT_BYTES', str(32 * 1024 * 1024)))
+
+# Vida media (horas) de la popularidad de un producto: un evento vale la mitad pasado este tiempo
+PRODUCT_POPULARITY_HALF_LIFE_HOURS = float(os.getenv('PRODUCT_POPULARITY_HALF_LIFE_HOURS', '72'))
+
+# Versiones reducidas de las imágenes de productos (WebP y JPEG) a estos anchos, generadas
+# en segundo plano con este número de hilos por proceso
+PRODUCT_IMAGE_RENDITION_WIDTHS = [
+    int(value) for value in os.getenv('PRODUCT_IMAGE_RENDITION_WIDTHS', '160,480,1080').split(',')
+]
+PRODUCT_IMAGE_RENDITION_WORKERS = int(os.getenv('PRODUCT_IMAGE_RENDITION_WORKERS', '2'))
+
+# Límites por defecto (CLP) de los rangos de precio en /api/products/facets/ (?price_buckets= los reemplaza)
+PRODUCT_FACET_PRICE_BUCKETS = [
+    int(value) for value in os.getenv('PRODUCT_FACET_PRICE_BUCKETS', '5000,10000,20000,50000,100000').split(',')
+]
+
 # Configuraciones legacy (comentadas)
 # DEEPAI_API_KEY = os.getenv('DEEPAI_API_KEY', '')  # Solo si quieres usar DeepAI
 
@@ -4,7 +4,7 @@ from django.contrib.auth.models import AnonymousUser
 from .models import Conversation, Message
 from .serializers import MessageSerializer
 from accounts.models import User
-import json
+from backend.renderers import dumps_str, loads
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -48,7 +48,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         try:
-            data = json.loads(text_data)
+            data = loads(text_data)
             message_type = data.get('type')
             
             if message_type == 'chat_message':
@@ -64,7 +64,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             elif message_type == 'typing':
                 await self.handle_typing(data)
                 
-        except (json.JSONDecodeError, Exception):
+        except (ValueError, Exception):
             pass  # Silenciar errores para mejor rendimiento
     async def handle_chat_message(self, data):
         """Manejar envío de nuevos mensajes"""
@@ -171,14 +171,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def chat_message_broadcast(self, event):
         """Enviar nuevo mensaje a todos los clientes"""
         try:
-            # Serializar de forma segura usando el método auxiliar
-            message_data = self.serialize_datetime_objects(event['message'])
-            
+            # dumps_str serializa datetime, Decimal y UUID directamente
             response_data = {
                 'type': 'new_message',
-                'message': message_data            }
+                'message': event['message']            }
             
-            await self.send(text_data=json.dumps(response_data))
+            await self.send(text_data=dumps_str(response_data))
             
         except Exception:
             # Enviar respuesta de error simplificada
@@ -190,7 +188,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         'error': 'Error al procesar mensaje'
                     }
                 }
-                await self.send(text_data=json.dumps(error_response))
+                await self.send(text_data=dumps_str(error_response))
             except Exception:
                 pass  # Silenciar para mejor rendimiento
     async def message_read_broadcast(self, event):
@@ -200,7 +198,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         # Solo enviar la notificación al emisor del mensaje
         if sender_user_id and self.scope["user"].id == sender_user_id:
-            await self.send(text_data=json.dumps({
+            await self.send(text_data=dumps_str({
                 'type': 'message_read',
                 'message_id': event['message_id'],
                 'reader_user_id': reader_user_id
@@ -208,7 +206,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def message_like_broadcast(self, event):
         """Notificar cambio de like en mensaje"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps_str({
             'type': 'message_like',
             'message_id': event['message_id'],
             'user_id': event['user_id'],            'liked': event['liked'],
@@ -218,31 +216,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def message_edit_broadcast(self, event):
         """Notificar edición de mensaje"""
         try:
-            # Asegurar que el mensaje está correctamente serializado
+            # dumps_str serializa los datetime del mensaje directamente
             message_data = event['message']
             
-            # Si el mensaje contiene objetos datetime, convertirlos
-            if isinstance(message_data, dict):
-                # Copiar el diccionario para no modificar el original
-                safe_message = {}
-                  # Procesar cada campo del mensaje
-                for key, value in message_data.items():
-                    if hasattr(value, 'isoformat'):  # Es un objeto datetime
-                        safe_message[key] = value.isoformat()
-                    elif value is None:
-                        safe_message[key] = None
-                    else:
-                        safe_message[key] = value
-                
-                message_data = safe_message
-            
             # Crear el mensaje de respuesta
             response_data = {
                 'type': 'message_edited',
                 'message': message_data
             }
             
-            await self.send(text_data=json.dumps(response_data))
+            await self.send(text_data=dumps_str(response_data))
             
         except Exception:
             # Enviar respuesta de error simplificada
@@ -263,13 +246,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         'error': 'Error al serializar mensaje editado'
                     }
                 }
-                await self.send(text_data=json.dumps(basic_response))
+                await self.send(text_data=dumps_str(basic_response))
             except Exception:
                 pass  # Silenciar para mejor rendimiento
     
     async def message_delete_broadcast(self, event):
         """Notificar eliminación de mensaje"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps_str({
             'type': 'message_deleted',
             'message_id': event['message_id']
         }))
@@ -278,7 +261,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """Notificar indicador de escritura"""
         # No enviar el evento al mismo usuario que está escribiendo
         if event['user_id'] != self.scope["user"].id:
-            await self.send(text_data=json.dumps({
+            await self.send(text_data=dumps_str({
                 'type': 'typing',
                 'user_id': event['user_id'],
                 'username': event['username'],                'is_typing': event['is_typing']
@@ -450,20 +433,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Message.DoesNotExist:
             return False
 
-    def serialize_datetime_objects(self, data):
-        """Método auxiliar para convertir objetos datetime a strings de forma recursiva"""
-        if isinstance(data, dict):
-            result = {}
-            for key, value in data.items():
-                result[key] = self.serialize_datetime_objects(value)
-            return result
-        elif isinstance(data, (list, tuple)):
-            return [self.serialize_datetime_objects(item) for item in data]
-        elif hasattr(data, 'isoformat'):  # Es un objeto datetime
-            return data.isoformat()
-        else:
-            return data
-
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     """Consumer para notificaciones generales del usuario"""
@@ -500,14 +469,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def new_conversation_notification(self, event):
         """Notificar nueva conversación"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps_str({
             'type': 'new_conversation',
             'conversation': event['conversation']
         }))
     
     async def conversation_update_notification(self, event):
         """Notificar actualización de conversación"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps_str({
             'type': 'conversation_update',
             'conversation_id': event['conversation_id'],
             'unread_count': event['unread_count']
@@ -515,7 +484,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def product_rejected_notification(self, event):
         """Notificar producto rechazado"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps_str({
             'type': 'product_rejected',
             'notification': event['notification']
-        }))
\ No newline at end of file
+        }))
+
+    async def product_review_completed(self, event):
+        """Notificar que terminó la revisión de un producto (aprobado o rechazado)"""
+        await self.send(text_data=dumps_str({
+            'type': 'product_review_completed',
+            'review': event['review']
+        }))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_message_reply_to'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'is_read', 'sender'], name='message_conv_read_sender_idx'),
+        ),
+    ]
@@ -34,6 +34,12 @@ class Message(models.Model):
     liked = models.BooleanField(default=False)
     # Usuarios que han dado like a este mensaje
     liked_by = models.ManyToManyField(User, related_name='liked_messages', blank=True)
+
+    class Meta:
+        indexes = [
+            # Mensajes no leídos de una conversación enviados por la otra persona
+            models.Index(fields=['conversation', 'is_read', 'sender'], name='message_conv_read_sender_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} in {self.conversation}"
\ No newline at end of file
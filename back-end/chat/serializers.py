@@ -2,7 +2,7 @@ from rest_framework import serializers
 from rest_framework import serializers
 from .models import Conversation, Message
 from accounts.serializers import UserSerializer
-from products.serializers import ProductSerializer
+from products.serializers import ProductCardSerializer
 from accounts.models import User
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -90,7 +90,7 @@ class ParticipantSerializer(serializers.ModelSerializer):
 
 class ConversationSerializer(serializers.ModelSerializer):
     participants = ParticipantSerializer(many=True, read_only=True)
-    product = ProductSerializer(read_only=True)
+    product = ProductCardSerializer(read_only=True)
     latest_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
     
@@ -1,19 +1,30 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import Exists, OuterRef, Prefetch
 from django.utils import timezone
 from .models import Conversation, Message
-from products.models import Product
+from products.models import Favorite, Product, ProductImage
+from products.pagination import CustomPageNumberPagination
 from .serializers import ConversationSerializer, MessageSerializer
 
 class ConversationViewSet(viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPageNumberPagination
     
     def get_queryset(self):
         """Retorna solo las conversaciones del usuario autenticado."""
         # Añadir conteo de mensajes no leídos para el usuario actual
-        return Conversation.objects.filter(participants=self.request.user)
+        # Tarjeta del producto con vendedor, categoría, imágenes y favorito precargados
+        products = Product.objects.select_related('seller', 'category').prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id'))
+        ).annotate(
+            favorited_by_user=Exists(Favorite.objects.filter(user=self.request.user, product=OuterRef('pk')))
+        )
+        return Conversation.objects.filter(participants=self.request.user).prefetch_related(
+            Prefetch('product', queryset=products)
+        ).order_by('-updated_at', '-id')
     
     def create(self, request, *args, **kwargs):
         product_id = request.data.get('product_id')
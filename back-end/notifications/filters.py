@@ -0,0 +1,12 @@
+import django_filters
+
+from .models import Notification
+
+
+class NotificationExportFilter(django_filters.FilterSet):
+    """Filtros de /api/notifications/export/: fechas (?created_after=&created_before=), tipo, usuario y leídas"""
+    created = django_filters.DateFromToRangeFilter(field_name='created_at')
+
+    class Meta:
+        model = Notification
+        fields = ['created', 'type', 'user', 'is_read']
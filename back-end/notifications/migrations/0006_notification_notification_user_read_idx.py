@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_extra_data'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_read_idx'),
+        ),
+    ]
@@ -95,6 +95,10 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Bandeja del usuario y contador de no leídas
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_read_idx'),
+        ]
         
     def __str__(self):
         return f"{self.get_type_display()} para {self.user.username}"
\ No newline at end of file
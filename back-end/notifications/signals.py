@@ -1,7 +1,7 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from chat.models import Message
-from products.models import Product, Favorite
+from products.models import Favorite
 from accounts.models import Rating
 from .models import Notification
 import logging
@@ -77,36 +77,31 @@ def create_favorite_notification(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error al crear notificación de favorito: {str(e)}")
 
-@receiver(post_save, sender=Product)
-def check_product_views(sender, instance, **kwargs):
+# Hitos de vistas para notificar al vendedor
+VIEW_MILESTONES = [50, 100, 500, 1000, 5000, 10000]
+
+def notify_view_milestones(product_id, seller_id, title, previous_count, new_count):
     """
-    Verifica el contador de vistas del producto y crea notificaciones cuando 
-    alcanza ciertos hitos (50, 100, 500, 1000, etc.)
+    Crea una notificación cuando el contador de vistas de un producto cruza un hito
+    (50, 100, 500, 1000, etc.). Se llama desde el vaciado del contador de vistas
+    (products.view_counter), que conoce el valor anterior y el nuevo.
     """
-    # Definimos los hitos de vistas para notificar
-    view_milestones = [50, 100, 500, 1000, 5000, 10000]
-    
     try:
-        # Verificar si el número de vistas actual ha alcanzado algún hito
-        views_count = instance.views_count
-        
-        # Solo verificamos productos con propietario definido
-        if not instance.seller:
+        crossed = [m for m in VIEW_MILESTONES if previous_count < m <= new_count]
+        if not crossed or not seller_id:
             return
-            
-        # Crear notificación si el número de vistas coincide exactamente con un hito
-        for milestone in view_milestones:
-            if views_count == milestone:
-                Notification.objects.create(
-                    user=instance.seller,
-                    type='views',
-                    title=f'¡Tu producto ha alcanzado {milestone} vistas!',
-                    message=f'Tu producto "{instance.title}" ha sido visto {milestone} veces. ¡Felicidades!',
-                    related_product=instance
-                )
-                
-                logger.info(f"Notificación de hito de vistas creada para {instance.seller.username}")
-                break
+        
+        # Si en un mismo vaciado se cruzan varios hitos, notificar solo el mayor
+        milestone = crossed[-1]
+        Notification.objects.create(
+            user_id=seller_id,
+            type='views',
+            title=f'¡Tu producto ha alcanzado {milestone} vistas!',
+            message=f'Tu producto "{title}" ha sido visto {milestone} veces. ¡Felicidades!',
+            related_product_id=product_id
+        )
+        
+        logger.info(f"Notificación de hito de vistas creada para el vendedor #{seller_id}")
     
     except Exception as e:
         logger.error(f"Error al verificar vistas del producto: {str(e)}")
@@ -197,4 +192,36 @@ def create_product_rejected_notification(seller, product_title, rejection_reason
         logger.info(f"Notificación de producto rechazado creada para {seller.username}: {product_title}")
     
     except Exception as e:
-        logger.error(f"Error al crear notificación de producto rechazado: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error al crear notificación de producto rechazado: {str(e)}")
+
+
+def send_product_review_completed(seller_id, product_id, product_title, new_status, verdict=None):
+    """
+    Envía al vendedor, por WebSocket, el resultado de la revisión de su producto.
+    Cubre aprobaciones y rechazos con un solo tipo de evento ('product_review_completed').
+    """
+    try:
+        from channels.layers import get_channel_layer
+        from asgiref.sync import async_to_sync
+        
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+        
+        async_to_sync(channel_layer.group_send)(
+            f'user_{seller_id}',
+            {
+                'type': 'product_review_completed',
+                'review': {
+                    'product_id': product_id,
+                    'product_title': product_title,
+                    'status': new_status,
+                    'verdict': verdict or {},
+                }
+            }
+        )
+        
+        logger.info(f"Resultado de revisión enviado al usuario {seller_id}: producto #{product_id} -> {new_status}")
+    
+    except Exception as e:
+        logger.error(f"Error al enviar resultado de revisión: {str(e)}")
\ No newline at end of file
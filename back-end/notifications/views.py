@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from products.exports import export_response
+from .filters import NotificationExportFilter
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -12,6 +14,19 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """Solo muestra las notificaciones del usuario autenticado"""
         return Notification.objects.filter(user=self.request.user)
     
+    EXPORT_COLUMNS = [
+        ('id', 'id'), ('user_id', 'user_id'), ('user_email', 'user__email'), ('type', 'type'),
+        ('title', 'title'), ('message', 'message'), ('from_user_id', 'from_user_id'),
+        ('related_product_id', 'related_product_id'), ('is_read', 'is_read'),
+        ('created_at', 'created_at'), ('extra_data', 'extra_data'),
+    ]
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Todas las notificaciones (auditoría) en NDJSON o CSV, en streaming; solo administradores"""
+        queryset = Notification.objects.order_by('pk')
+        return export_response(request, queryset, self.EXPORT_COLUMNS, NotificationExportFilter, 'notificaciones')
+
     @action(detail=False, methods=['get'])
     def unread(self, request):
         """Devuelve solo las notificaciones no leídas"""
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, ProductImage, Favorite
+from .models import Category, Product, ProductImage, Favorite, ModerationRecord
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'description')
@@ -15,6 +15,11 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     inlines = [ProductImageInline]
 
+class ModerationRecordAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product_title', 'seller', 'approved', 'review_depth', 'risk_score', 'created_at')
+    list_filter = ('approved', 'review_depth', 'created_at')
+    search_fields = ('product_title', 'reason')
+
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'product', 'created_at')
     list_filter = ('created_at',)
@@ -23,3 +28,4 @@ admin.site.register(Category, CategoryAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(ProductImage)
 admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(ModerationRecord, ModerationRecordAdmin)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        import products.signals  # Registrar los signals de sincronización de búsqueda
@@ -0,0 +1,166 @@
+"""
+Operaciones masivas sobre productos (POST /api/products/bulk/).
+
+La propiedad de todos los productos se valida con una sola consulta y los cambios se
+aplican sobre el conjunto con update(), bulk_update() o delete(), en una transacción.
+Como update() y bulk_update() no disparan signals, la invalidación de cachés y de los
+índices en memoria se hace una sola vez al final (ver products/signals.py para el caso
+de un producto).
+"""
+
+import logging
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+
+from .cache import CATALOG, CATEGORIES, WEEKLY_OFFERS, bump_version
+from .models import CategoryProductCount, PriceChange, Product
+from .similar import similarity_index
+from .suggest import suggestion_index
+
+logger = logging.getLogger(__name__)
+
+LOADED_FIELDS = (
+    'id', 'seller_id', 'title', 'status', 'price', 'original_price', 'views_count',
+    'category_id', 'manually_unavailable', 'pending_review_changes', 'discount_pct', 'discounted_at',
+)
+AVAILABILITY = {
+    'mark_unavailable': ('unavailable', True),
+    'mark_available': ('available', False),
+}
+PENDING_REASON = 'El producto está en revisión.'
+# Mismos límites que un precio fijo (ProductBulkActionSerializer.price, min_value=1) y que la columna
+MIN_PRICE = Decimal('1')
+MAX_PRICE = Decimal('99999999.99')
+
+
+def load_owned_products(user, ids):
+    """Productos pedidos, verificando en una consulta que existan y sean del usuario (o que sea admin)"""
+    products = list(Product.objects.select_for_update().filter(pk__in=ids).only(*LOADED_FIELDS))
+    missing = sorted(set(ids) - {product.pk for product in products})
+    if missing:
+        raise NotFound({'detail': 'Algunos productos no existen.', 'ids': missing})
+    if not user.is_staff:
+        foreign = sorted(product.pk for product in products if product.seller_id != user.pk)
+        if foreign:
+            raise PermissionDenied({'detail': 'No tienes permiso para modificar estos productos.', 'ids': foreign})
+    return products
+
+
+def new_price(product, price=None, percent=None):
+    if price is not None:
+        return price
+    factor = (Decimal(100) + percent) / Decimal(100)
+    return (product.price * factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def apply_bulk_action(user, action, ids, price=None, percent=None):
+    """
+    Aplica la acción a todos los productos o a ninguno. Devuelve los ids procesados y
+    los omitidos con su motivo (por ejemplo, productos en revisión al cambiar disponibilidad).
+    """
+    skipped = []
+    rereview = []
+    counts_changed = False
+    now = timezone.now()
+
+    with transaction.atomic():
+        products = load_owned_products(user, ids)
+
+        if action == 'delete':
+            processed = [product.pk for product in products]
+            # Cascada a imágenes, favoritos y conversaciones; los signals de post_delete
+            # limpian el índice de búsqueda de cada producto
+            Product.objects.filter(pk__in=processed).delete()
+
+        elif action in AVAILABILITY:
+            new_status, manually_unavailable = AVAILABILITY[action]
+            targets = []
+            for product in products:
+                if product.status == 'pending':
+                    skipped.append({'id': product.pk, 'reason': PENDING_REASON})
+                else:
+                    targets.append(product)
+            processed = [product.pk for product in targets]
+            Product.objects.filter(pk__in=processed).update(
+                status=new_status, manually_unavailable=manually_unavailable, updated_at=now
+            )
+            # update() no pasa por los signals: los contadores por categoría se mueven aquí
+            step = 1 if new_status == 'available' else -1
+            category_deltas = Counter(
+                product.category_id for product in targets
+                if (product.status == 'available') != (new_status == 'available')
+            )
+            counts_changed = CategoryProductCount.apply_deltas(
+                {category_id: step * count for category_id, count in category_deltas.items()}
+            )
+            for product in targets:
+                product.status = new_status
+                product.manually_unavailable = manually_unavailable
+
+        else:  # reprice
+            values = {product.pk: new_price(product, price, percent) for product in products}
+            # Un porcentaje puede dejar algún precio fuera de rango: se rechaza la acción completa
+            out_of_range = sorted(pk for pk, value in values.items() if not MIN_PRICE <= value <= MAX_PRICE)
+            if out_of_range:
+                raise ValidationError({
+                    'detail': f'El nuevo precio debe estar entre {MIN_PRICE} y {MAX_PRICE}.',
+                    'ids': out_of_range,
+                })
+            changed = []
+            for product in products:
+                value = values[product.pk]
+                if value == product.price:
+                    skipped.append({'id': product.pk, 'reason': 'El precio no cambia.'})
+                    continue
+                previous = product.price
+                # Igual que update(): el primer cambio guarda el precio anterior como original
+                if product.original_price is None:
+                    product.original_price = previous
+                product.price = value
+                product.update_discount(previous, now)
+                product.updated_at = now
+                changed.append((product, previous))
+            processed = [product.pk for product, _ in changed]
+            if changed:
+                # Un solo UPDATE con CASE por columna y el historial en un INSERT
+                Product.objects.bulk_update(
+                    [product for product, _ in changed],
+                    [*Product.PRICE_FIELDS, *Product.DISCOUNT_FIELDS, 'updated_at'],
+                )
+                PriceChange.objects.bulk_create([
+                    PriceChange(product=product, old_price=previous, new_price=product.price)
+                    for product, previous in changed
+                ])
+            # Igual que una edición individual: si ya hay una re-revisión pendiente, el precio se suma a ella
+            rereview = [product for product, _ in changed if product.pending_review_changes]
+
+    if processed:
+        bump_version(WEEKLY_OFFERS)
+        bump_version(CATALOG)
+        if counts_changed:
+            bump_version(CATEGORIES)
+        if action in AVAILABILITY:
+            processed_ids = set(processed)
+            updated = [product for product in products if product.pk in processed_ids]
+
+            def update_indexes():
+                for product in updated:
+                    suggestion_index.update_product(product)
+                    similarity_index.update_status(product.pk, product.status)
+
+            # Igual que los signals: los índices en memoria cambian al confirmar la transacción
+            transaction.on_commit(update_indexes)
+
+    if rereview:
+        from .review import schedule_rereview
+
+        for product in rereview:
+            product.refresh_from_db()
+            schedule_rereview(product, ['price'])
+
+    logger.info(f"Operación masiva '{action}' de {user.pk}: {len(processed)} productos, {len(skipped)} omitidos")
+    return {'action': action, 'processed': processed, 'skipped': skipped}
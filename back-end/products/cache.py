@@ -0,0 +1,216 @@
+"""
+Caché versionada para respuestas derivadas del catálogo.
+
+Cada espacio de nombres tiene un número de versión, guardado en la base de datos
+(CacheVersion) para que sea el mismo en todos los procesos, que forma parte de las claves. Invalidar es incrementar la versión: las entradas anteriores
+dejan de leerse y expiran solas, sin tener que conocer ni borrar cada clave.
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+WEEKLY_OFFERS = 'weekly_offers'
+# Versión global del catálogo: cambia con cualquier alta, edición o baja de productos,
+# imágenes o categorías (ver products/signals.py)
+CATALOG = 'catalog'
+# Lista de categorías con sus conteos (cambia con las categorías y la disponibilidad de productos)
+CATEGORIES = 'categories'
+# Favoritos de cada usuario (cambian is_favorite en las respuestas autenticadas)
+FAVORITES = 'favorites'
+
+# Mientras un proceso regenera una entrada, los demás esperan hasta este tiempo antes de calcularla ellos
+REBUILD_LOCK_SECONDS = 10
+REBUILD_WAIT_SECONDS = 2
+REBUILD_POLL_SECONDS = 0.05
+
+
+def get_versions(*namespaces):
+    """
+    {espacio de nombres: (versión, epoch del último cambio)} con una sola consulta.
+    Las versiones viven en la base de datos (CacheVersion) y no en la caché: con caché
+    local por proceso, un incremento hecho en otro proceso (otro worker web o un
+    comando como review_pending_products --loop) no llegaría nunca a este.
+    """
+    from .models import CacheVersion
+
+    rows = {
+        namespace: (version, int(modified_at.timestamp()))
+        for namespace, version, modified_at in CacheVersion.objects.filter(
+            namespace__in=namespaces
+        ).values_list('namespace', 'version', 'modified_at')
+    }
+    # Sin fila todavía (nunca se invalidó): versión 0. Las lecturas no escriben; el
+    # primer incremento crea la fila con una versión basada en la hora actual
+    return {namespace: rows.get(namespace, (0, 0)) for namespace in namespaces}
+
+
+def get_version(namespace):
+    return get_versions(namespace)[namespace][0]
+
+
+def get_last_modified(namespace):
+    """Momento (epoch) del último cambio registrado en el espacio de nombres"""
+    return get_versions(namespace)[namespace][1]
+
+
+def _apply_bump(namespace):
+    from .models import CacheVersion
+
+    now = timezone.now()
+    updated = CacheVersion.objects.filter(namespace=namespace).update(
+        version=F('version') + 1, modified_at=now
+    )
+    if not updated:
+        # Partir desde la hora actual: si la fila se borra no se reutilizan claves antiguas
+        _, created = CacheVersion.objects.get_or_create(
+            namespace=namespace, defaults={'version': int(time.time() * 1000), 'modified_at': now}
+        )
+        if not created:
+            CacheVersion.objects.filter(namespace=namespace).update(
+                version=F('version') + 1, modified_at=now
+            )
+
+
+def bump_version(namespace):
+    """
+    Invalida el espacio de nombres al confirmar la transacción actual (de inmediato fuera
+    de una). Así ningún proceso ve la versión nueva con los datos viejos todavía sin
+    confirmar, y la fila de la versión no queda bloqueada mientras dura la transacción.
+    """
+    transaction.on_commit(lambda: _apply_bump(namespace))
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, f'v{get_version(namespace)}', *(str(part) for part in parts)])
+
+
+def get_or_build(key, builder, timeout):
+    """
+    Lee una entrada de la caché o la regenera con una sola ejecución concurrente
+    (single-flight): solo quien obtiene el lock llama a builder; el resto espera el resultado.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, REBUILD_LOCK_SECONDS):
+        try:
+            value = builder()
+            if value is not None:
+                cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + REBUILD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL_SECONDS)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    # Quien tenía el lock tardó demasiado: responder sin esperar más
+    return builder()
+
+
+def normalized_query(request):
+    """Parámetros de la consulta ordenados y sin valores vacíos, para que URLs equivalentes compartan entrada"""
+    items = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    return urlencode(items)
+
+
+def cached_catalog_response(request, view_func, version=None):
+    """
+    Respuesta cacheada de un endpoint público del catálogo para usuarios anónimos.
+
+    La clave incluye la versión del catálogo, el host (las URLs de imágenes son
+    absolutas), la ruta y los parámetros normalizados. Solo se guardan respuestas 200.
+    version: la del catálogo si ya se leyó (para no volver a consultarla).
+    """
+    if request.method != 'GET' or request.user.is_authenticated:
+        return view_func()
+
+    if version is None:
+        version = get_version(CATALOG)
+    key = ':'.join([
+        CATALOG, f'v{version}', request.scheme, request.get_host(), request.path, normalized_query(request)
+    ])
+    fresh = {}
+
+    def build():
+        response = view_func()
+        fresh['response'] = response
+        if response.status_code != status.HTTP_200_OK:
+            return None
+        return response.data
+
+    data = get_or_build(key, build, settings.CATALOG_CACHE_TIMEOUT)
+    if 'response' in fresh:
+        return fresh['response']
+    if data is None:
+        return view_func()
+    return Response(data)
+
+
+def catalog_validators(request):
+    """
+    ETag, Last-Modified y versión del catálogo para una respuesta, con una sola consulta
+    por clave primaria.
+
+    La versión del catálogo cambia con cualquier edición de productos, imágenes o
+    categorías; para usuarios autenticados se agrega la versión de sus favoritos.
+    """
+    user = request.user
+    namespaces = [CATALOG]
+    if user.is_authenticated:
+        namespaces.append(f'{FAVORITES}:{user.pk}')
+    versions = get_versions(*namespaces)
+
+    parts = [request.path, normalized_query(request), versions[CATALOG][0]]
+    if user.is_authenticated:
+        parts += [user.pk, versions[namespaces[1]][0]]
+    # None mientras ningún espacio de nombres registre un cambio (solo se usa el ETag)
+    last_modified = max(modified for _, modified in versions.values()) or None
+    etag = '"%s"' % hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return etag, last_modified, versions[CATALOG][0]
+
+
+def conditional_catalog_response(request, view_func):
+    """
+    Responde 304 si el cliente ya tiene la versión actual (If-None-Match / If-Modified-Since)
+    antes de consultar los productos o serializar; si no, entrega la respuesta (cacheada para anónimos)
+    con sus validadores.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return view_func()
+
+    etag, last_modified, version = catalog_validators(request)
+    not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = cached_catalog_response(request, view_func, version)
+    if response.status_code == status.HTTP_200_OK:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # El navegador puede guardar la respuesta pero debe revalidarla en cada uso
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
@@ -0,0 +1,66 @@
+"""
+Lista de categorías (/api/categories/) servida desde la memoria del proceso.
+
+La respuesta completa (JSON ya codificado y su ETag fuerte, el hash del contenido) se
+guarda en cada proceso junto con la versión CATEGORIES con que se construyó. Esa
+versión vive en la base de datos (CacheVersion, ver products/cache.py) y los signals la
+incrementan al confirmar un cambio de categoría o de cantidad de productos disponibles
+(ver products/signals.py), así que un cambio hecho por cualquier proceso se ve en todos.
+Cada petición solo lee la versión (una consulta por clave primaria) y, si coincide,
+responde sin consultar categorías ni serializar. Como resguardo ante cambios hechos sin
+signals, la copia también se reconstruye pasados CATALOG_CACHE_TIMEOUT segundos.
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from backend.renderers import dumps
+
+from .cache import CATEGORIES, get_version
+from .models import Category
+
+
+class CategoryListCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._built_at = None
+        self._entry = None  # (cuerpo JSON, ETag), o None si no hay categorías
+
+    def get(self):
+        version = get_version(CATEGORIES)
+        with self._lock:
+            if (
+                self._version != version
+                or time.monotonic() - self._built_at > settings.CATALOG_CACHE_TIMEOUT
+            ):
+                # La versión se lee antes de construir: un cambio durante la consulta fuerza otra reconstrucción
+                self._entry = self.build()
+                self._version = version
+                self._built_at = time.monotonic()
+            return self._entry
+
+    def build(self):
+        from .serializers import CategoryListSerializer
+
+        categories = Category.objects.annotate(
+            available_products=Coalesce('product_count__available_products', Value(0))
+        ).order_by('name')
+        data = CategoryListSerializer(categories, many=True).data
+        if not data:
+            return None
+        body = dumps(data)
+        return body, '"%s"' % hashlib.sha1(body).hexdigest()
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._entry = None
+
+
+category_list_cache = CategoryListCache()
@@ -0,0 +1,142 @@
+"""
+Conteos por faceta para la búsqueda de productos (/api/products/facets/).
+
+Recibe los mismos parámetros que el listado (ProductFilter y ?search=) y calcula en
+una sola consulta agregada, con Count(filter=Q), cuántos productos hay por categoría,
+condición, estado y rango de precio. Cada faceta ignora su propio filtro para que la
+interfaz muestre cuántos resultados habría al cambiarlo (por ejemplo, el resto de las
+categorías cuando ya hay una seleccionada).
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+from django_filters.constants import EMPTY_VALUES
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import ValidationError
+
+from .cache import CATALOG, get_or_build, versioned_key
+from .filters import ProductFilter
+from .models import Category, Product
+
+PRICE_BUCKETS_PARAM = 'price_buckets'
+MAX_PRICE_BUCKETS = 20
+
+
+def parse_price_buckets(value):
+    """Límites de los rangos de precio ('5000,10000,50000'), crecientes y positivos"""
+    if not value:
+        return list(settings.PRODUCT_FACET_PRICE_BUCKETS)
+    try:
+        bounds = sorted({Decimal(part.strip()) for part in value.split(',') if part.strip()})
+    except InvalidOperation:
+        raise ValidationError({PRICE_BUCKETS_PARAM: 'Debe ser una lista de precios separados por comas.'})
+    if not bounds or bounds[0] <= 0 or len(bounds) > MAX_PRICE_BUCKETS:
+        raise ValidationError({
+            PRICE_BUCKETS_PARAM: f'Indique entre 1 y {MAX_PRICE_BUCKETS} precios mayores que cero.'
+        })
+    return bounds
+
+
+def get_filter_conditions(request):
+    """
+    Condiciones de ProductFilter agrupadas por campo del modelo (min_price y max_price
+    quedan juntos en 'price'), para poder omitir la de cada faceta.
+    """
+    filterset = ProductFilter(request.query_params, queryset=Product.objects.none(), request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+
+    conditions = {}
+    for name, filter_ in filterset.filters.items():
+        value = filterset.form.cleaned_data.get(name)
+        if value in EMPTY_VALUES:
+            continue
+        if hasattr(filter_, 'lookup_value'):
+            # Filtros que transforman el valor recibido (por ejemplo, días -> fecha)
+            value = filter_.lookup_value(value)
+        lookup = Q(**{f'{filter_.field_name}__{filter_.lookup_expr}': value})
+        conditions[filter_.field_name] = conditions.get(filter_.field_name, Q()) & lookup
+    return conditions
+
+
+def get_categories():
+    """(id, nombre) de las categorías; cambian poco, se cachean con la versión del catálogo"""
+    return get_or_build(
+        versioned_key(CATALOG, 'facet_categories'),
+        lambda: list(Category.objects.order_by('name').values_list('id', 'name')),
+        settings.CATALOG_CACHE_TIMEOUT,
+    )
+
+
+def price_bucket_ranges(bounds):
+    """[(desde, hasta)] con el primer rango desde 0 y el último abierto"""
+    edges = [Decimal(0), *bounds, None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def compute_facets(queryset, conditions, bounds):
+    """
+    queryset: productos visibles y ya filtrados por la búsqueda de texto.
+    conditions: resultado de get_filter_conditions.
+    """
+
+    def excluding(field):
+        combined = Q()
+        for name, condition in conditions.items():
+            if name != field:
+                combined &= condition
+        return combined
+
+    all_conditions = excluding(None)
+    categories = get_categories()
+    condition_choices = Product._meta.get_field('condition').choices
+    ranges = price_bucket_ranges(bounds)
+
+    aggregates = {'total': Count('pk', filter=all_conditions)}
+    for category_id, _ in categories:
+        aggregates[f'category_{category_id}'] = Count(
+            'pk', filter=excluding('category') & Q(category_id=category_id)
+        )
+    for value, _ in condition_choices:
+        aggregates[f'condition_{value}'] = Count('pk', filter=excluding('condition') & Q(condition=value))
+    for value, _ in Product.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('pk', filter=all_conditions & Q(status=value))
+    for i, (low, high) in enumerate(ranges):
+        bucket = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+        aggregates[f'price_{i}'] = Count('pk', filter=excluding('price') & bucket)
+    # Extremos del deslizador de precio: sin el propio filtro de precio
+    aggregates['price_min'] = Min('price', filter=excluding('price'))
+    aggregates['price_max'] = Max('price', filter=excluding('price'))
+
+    counts = queryset.aggregate(**aggregates)
+
+    def choice_counts(prefix, choices):
+        return [
+            {'value': value, 'label': label, 'count': counts[f'{prefix}_{value}']}
+            for value, label in choices
+            if counts[f'{prefix}_{value}']
+        ]
+
+    return {
+        'total': counts['total'],
+        'category': sorted(
+            (
+                {'id': category_id, 'name': name, 'count': counts[f'category_{category_id}']}
+                for category_id, name in categories
+                if counts[f'category_{category_id}']
+            ),
+            key=lambda item: -item['count']
+        ),
+        'condition': choice_counts('condition', condition_choices),
+        'status': choice_counts('status', Product.STATUS_CHOICES),
+        'price': {
+            'min': counts['price_min'],
+            'max': counts['price_max'],
+            'buckets': [
+                {'min': low, 'max': high, 'count': counts[f'price_{i}']}
+                for i, (low, high) in enumerate(ranges)
+            ],
+        },
+    }
@@ -1,13 +1,54 @@
 import django_filters
-from .models import Product
+from datetime import timedelta
+from django.utils import timezone
+from .models import ModerationRecord, Product
+
+
+class DaysAgoFilter(django_filters.NumberFilter):
+    """Recibe una cantidad de días y filtra desde ese momento (por ejemplo, ?discounted_within=7)"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('lookup_expr', 'gte')
+        super().__init__(*args, **kwargs)
+
+    def lookup_value(self, value):
+        return timezone.now() - timedelta(days=float(value))
+
+    def filter(self, qs, value):
+        if value in django_filters.constants.EMPTY_VALUES:
+            return qs
+        return super().filter(qs, self.lookup_value(value))
+
 
 class ProductFilter(django_filters.FilterSet):
     """
     Filtro personalizado para productos que incluye filtrado por rango de precios
+    y por descuento (porcentaje mínimo y días desde la última baja de precio)
     """
     min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
+    min_discount = django_filters.NumberFilter(field_name='discount_pct', lookup_expr='gte')
+    discounted_within = DaysAgoFilter(field_name='discounted_at')
     
     class Meta:
         model = Product
-        fields = ['category', 'condition', 'min_price', 'max_price']
+        fields = ['category', 'condition', 'min_price', 'max_price', 'min_discount', 'discounted_within']
+
+
+class ProductExportFilter(django_filters.FilterSet):
+    """Filtros de /api/products/export/: ?created_after=&created_before= (fechas), estado, categoría y vendedor"""
+    created = django_filters.DateFromToRangeFilter(field_name='created_at')
+
+    class Meta:
+        model = Product
+        fields = ['created', 'status', 'category', 'seller']
+
+
+class ModerationExportFilter(django_filters.FilterSet):
+    """Filtros de /api/products/moderation/export/: fechas, resultado (?approved=true|false) y categoría"""
+    created = django_filters.DateFromToRangeFilter(field_name='created_at')
+    category = django_filters.NumberFilter(field_name='product__category')
+
+    class Meta:
+        model = ModerationRecord
+        fields = ['created', 'approved', 'review_depth', 'seller', 'category']
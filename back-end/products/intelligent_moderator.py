@@ -1,15 +1,26 @@
 """
 Moderador inteligente de productos: prioriza IA para imágenes y solo usa validaciones mínimas de texto como respaldo.
+Los productos de vendedores confiables usan la vía rápida: búsqueda de hashes de imágenes
+ya rechazadas en lugar del análisis con IA (ver products.risk).
 """
 
 import os
 import logging
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Iterable, List, NamedTuple, Optional
 from products.models import Product
 from .free_ai_moderator import analyze_image_with_free_ai
+from .risk import compute_image_hashes, find_rejected_image_hash
 
 logger = logging.getLogger(__name__)
 
+
+class ModerationResult(NamedTuple):
+    approved: bool
+    reason: str
+    # Imágenes que la IA marcó como inapropiadas: solo sus hashes se guardan como rechazados
+    flagged_images: Tuple[int, ...] = ()
+
+
 class IntelligentProductModerator:
     CRITICAL_BANNED_WORDS = [
         'cocaina', 'heroina', 'lsd', 'mdma', 'ecstasy', 'metanfetamina', 'crack', 'fentanilo',
@@ -17,37 +28,59 @@ class IntelligentProductModerator:
         'prostitucion', 'escort sexual', 'servicios sexuales',
         'cedula falsa', 'pasaporte falso', 'dinero falso', 'billetes falsos',
     ]
-    def moderate_product(self, product: Product) -> Tuple[bool, str]:
+    def moderate_product(self, product: Product, depth: str = 'full', image_ids: Optional[Iterable[int]] = None,
+                         image_hashes: Optional[List[str]] = None) -> ModerationResult:
+        """image_hashes: hashes ya calculados por quien llama (products.review), para no leer las imágenes dos veces"""
         try:
-            # 1. Análisis IA de imágenes
             images = product.images.all()
             if not images.exists():
-                return False, 'El producto no tiene imágenes para analizar.'
-            for image in images:
-                if not os.path.exists(image.image.path):
-                    continue
-                result = analyze_image_with_free_ai(image.image.path)
-                if not result.get('is_appropriate', True):
-                    return False, f"Imagen inapropiada detectada por IA: {result.get('reason', 'Contenido inapropiado')}"
+                return ModerationResult(False, 'El producto no tiene imágenes para analizar.')
+            if depth == 'fast':
+                # 1. Vía rápida: comparar con hashes de imágenes ya rechazadas
+                if image_hashes is None:
+                    image_hashes = compute_image_hashes(images)
+                known = find_rejected_image_hash(image_hashes)
+                if known:
+                    return ModerationResult(
+                        False, f"Imagen previamente rechazada: {known.record.reason or 'Contenido inapropiado'}"
+                    )
+            else:
+                # 1. Análisis IA de imágenes (solo las indicadas, si se especifican)
+                image_ids = set(image_ids) if image_ids else None
+                for image in images:
+                    if image_ids is not None and image.id not in image_ids:
+                        continue
+                    if not os.path.exists(image.image.path):
+                        continue
+                    result = analyze_image_with_free_ai(image.image.path)
+                    if not result.get('is_appropriate', True):
+                        return ModerationResult(
+                            False,
+                            f"Imagen inapropiada detectada por IA: {result.get('reason', 'Contenido inapropiado')}",
+                            (image.id,),
+                        )
             # 2. Validación crítica de texto (solo palabras MUY específicas)
             content = f"{product.title} {product.description}".lower()
             for word in self.CRITICAL_BANNED_WORDS:
                 if word in content:
-                    return False, f"Palabra prohibida detectada en el texto: {word}"
+                    return ModerationResult(False, f"Palabra prohibida detectada en el texto: {word}")
             # 3. Validaciones mínimas (precio y longitud)
             if product.price <= 0:
-                return False, 'El precio debe ser mayor a 0.'
+                return ModerationResult(False, 'El precio debe ser mayor a 0.')
             if product.price > 50000000:
-                return False, 'Precio excesivamente alto (posible error o fraude).'
+                return ModerationResult(False, 'Precio excesivamente alto (posible error o fraude).')
             if len(product.title.strip()) < 3:
-                return False, 'Título demasiado corto (mínimo 3 caracteres).'
+                return ModerationResult(False, 'Título demasiado corto (mínimo 3 caracteres).')
             if len(product.description.strip()) < 10:
-                return False, 'Descripción demasiado corta (mínimo 10 caracteres).'
-            return True, 'Producto aprobado por IA y validaciones básicas.'
+                return ModerationResult(False, 'Descripción demasiado corta (mínimo 10 caracteres).')
+            if depth == 'fast':
+                return ModerationResult(True, 'Producto aprobado por vía rápida (vendedor confiable).')
+            return ModerationResult(True, 'Producto aprobado por IA y validaciones básicas.')
         except Exception as e:
             logger.error(f"Error en moderación inteligente: {str(e)}")
-            return False, f"Error en moderación: {str(e)}"
+            return ModerationResult(False, f"Error en moderación: {str(e)}")
 
 intelligent_moderator = IntelligentProductModerator()
-def moderate_product_with_ai(product: Product) -> Tuple[bool, str]:
-    return intelligent_moderator.moderate_product(product)
+def moderate_product_with_ai(product: Product, depth: str = 'full', image_ids: Optional[Iterable[int]] = None,
+                             image_hashes: Optional[List[str]] = None) -> ModerationResult:
+    return intelligent_moderator.moderate_product(product, depth, image_ids, image_hashes)
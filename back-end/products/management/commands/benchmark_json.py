@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import User
+from backend.renderers import ORJSONParser, ORJSONRenderer, orjson
+from products.models import Category, Product, ProductImage
+from products.serializers import ProductSerializer
+from rest_framework.parsers import JSONParser
+import io
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compara el renderer/parser JSON estándar de DRF con el de orjson sobre una página de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help='Productos en la página')
+        parser.add_argument('--repeat', type=int, default=200, help='Repeticiones por medición')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson no está instalado: ORJSONRenderer usa la librería estándar'))
+
+        with transaction.atomic():
+            data = self.build_page(options['items'])
+            # Los datos sintéticos no se guardan
+            transaction.set_rollback(True)
+
+        repeat = options['repeat']
+        rendered = JSONRenderer().render(data)
+        results = {
+            'items': options['items'],
+            'payload_bytes': len(rendered),
+            'render_ms': {
+                'stdlib': self.measure(lambda: JSONRenderer().render(data), repeat),
+                'orjson': self.measure(lambda: ORJSONRenderer().render(data), repeat),
+            },
+            'parse_ms': {
+                'stdlib': self.measure(lambda: JSONParser().parse(io.BytesIO(rendered)), repeat),
+                'orjson': self.measure(lambda: ORJSONParser().parse(io.BytesIO(rendered)), repeat),
+            },
+        }
+        for key in ('render_ms', 'parse_ms'):
+            timings = results[key]
+            timings['speedup'] = round(timings['stdlib'] / timings['orjson'], 1) if timings['orjson'] else None
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def build_page(self, items):
+        seller = User.objects.create_user(email='benchmark-json@uoh.cl', password=None)
+        category = Category.objects.create(name='Benchmark JSON')
+        products = Product.objects.bulk_create([
+            Product(
+                title=f'Producto de prueba número {i}',
+                description='Descripción de un producto publicado en el marketplace UOH. ' * 5,
+                price=1990 + i, original_price=2990 + i, seller=seller, category=category,
+                condition='good', status='available',
+            )
+            for i in range(items)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'product_images/benchmark_{product.id}_{n}.jpg', is_primary=n == 0)
+            for product in products for n in range(3)
+        ])
+        queryset = Product.objects.filter(pk__in=[p.pk for p in products]).select_related(
+            'seller__profile', 'category'
+        ).prefetch_related('images')
+        request = Request(APIRequestFactory().get('/api/products/'))
+        results = ProductSerializer(queryset, many=True, context={'request': request}).data
+        return {'count': items, 'next': None, 'previous': None, 'results': results}
+
+    def measure(self, func, repeat):
+        """Milisegundos promedio por llamada"""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return round((time.perf_counter() - started) / repeat * 1000, 3)
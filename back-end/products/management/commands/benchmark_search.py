@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import User
+from products.models import Category, Product
+from products.search import ProductOrderingFilter, ProductSearchFilter, rebuild_search_index
+from products.views import ProductViewSet
+import json
+import random
+import statistics
+import time
+
+WORDS = [
+    'libro', 'cálculo', 'bicicleta', 'notebook', 'calculadora', 'guitarra', 'mochila', 'silla',
+    'escritorio', 'lámpara', 'audífonos', 'teclado', 'zapatillas', 'chaqueta', 'cuaderno', 'impresora',
+    'monitor', 'celular', 'cargador', 'parlante', 'microondas', 'hervidor', 'colchón', 'raqueta',
+]
+ADJECTIVES = ['usado', 'nuevo', 'impecable', 'barato', 'original', 'grande', 'pequeño', 'rojo', 'negro']
+FILLER = [
+    'estado', 'entrega', 'campus', 'rancagua', 'precio', 'conversable', 'poco', 'uso', 'funciona',
+    'perfecto', 'incluye', 'caja', 'manual', 'detalles', 'mínimos', 'retiro', 'sede', 'semestre',
+    'pasado', 'vendo', 'por', 'cambio', 'carrera', 'consultas', 'mensaje', 'disponible', 'semana',
+    'tarde', 'mañana', 'color', 'marca', 'modelo', 'garantía', 'boleta', 'comprado', 'año',
+]
+QUERIES = ['libro cálculo', 'bicicleta', 'calculadora', 'guitarra nueva', 'audifonos', 'mochila negra', 'bicicelta']
+
+
+class Command(BaseCommand):
+    help = 'Mide la búsqueda de productos (índice de texto completo vs icontains) sobre datos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000,
+                            help='Cantidad de productos sintéticos a generar (se descartan al terminar)')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Repeticiones por consulta')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['products'])
+            results = {
+                'vendor': connection.vendor,
+                'products': options['products'],
+                'indexed': self.measure(ProductSearchFilter(), options['repeat']),
+                'icontains': self.measure(filters.SearchFilter(), options['repeat']),
+            }
+            # Los datos sintéticos no se guardan
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+
+    def seed(self, total):
+        rng = random.Random(42)
+        seller = User.objects.create_user(email='benchmark-search@uoh.cl', password=None)
+        category = Category.objects.create(name='Benchmark búsqueda')
+        batch = []
+        for i in range(total):
+            title = ' '.join(rng.sample(WORDS, 2) + rng.sample(ADJECTIVES, 1))
+            description = ' '.join([title] + rng.choices(FILLER, k=25))
+            batch.append(Product(
+                title=title, description=description, price=1000 + i % 50000,
+                seller=seller, category=category, condition='good', status='available',
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        # bulk_create no dispara signals: reconstruir la tabla FTS5 (en PostgreSQL la columna es generada)
+        rebuild_search_index()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE products_product')
+
+    def measure(self, search_filter, repeat):
+        factory = APIRequestFactory()
+        view = ProductViewSet()
+        timings = {}
+        for query in QUERIES:
+            request = Request(factory.get('/api/products/', {'search': query}))
+            view.request = request
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                queryset = search_filter.filter_queryset(request, Product.objects.filter(status='available'), view)
+                queryset = ProductOrderingFilter().filter_queryset(request, queryset, view)
+                list(queryset.values_list('id', flat=True)[:12])
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            timings[query] = {
+                'p50_ms': round(statistics.median(samples), 2),
+                'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 2),
+            }
+        return timings
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from accounts.models import User
+from products.models import Category, Product
+from products.similar import SimilarityIndex
+from .benchmark_search import ADJECTIVES, FILLER, WORDS
+import json
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = 'Mide la construcción y las consultas del índice de productos similares sobre datos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000,
+                            help='Cantidad de productos sintéticos a generar (se descartan al terminar)')
+        parser.add_argument('--queries', type=int, default=200,
+                            help='Cantidad de productos consultados')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['products'])
+            index = SimilarityIndex()
+
+            started = time.perf_counter()
+            index.rebuild()
+            build_seconds = time.perf_counter() - started
+
+            rng = random.Random(7)
+            ids = [int(product_id) for product_id in rng.sample(list(index.ids), min(options['queries'], len(index.ids)))]
+            samples = []
+            for product_id in ids:
+                started = time.perf_counter()
+                index.similar(product_id, 8)
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+
+            results = {
+                'vendor': connection.vendor,
+                'products': options['products'],
+                'build_seconds': round(build_seconds, 2),
+                'index_mb': round(sum(
+                    m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (index.matrix, index.inverted)
+                ) / 2 ** 20, 1),
+                'similar_p50_ms': round(statistics.median(samples), 2),
+                'similar_p95_ms': round(samples[int(len(samples) * 0.95) - 1], 2),
+            }
+            # Los datos sintéticos no se guardan
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+
+    def seed(self, total):
+        rng = random.Random(42)
+        seller = User.objects.create_user(email='benchmark-similar@uoh.cl', password=None)
+        categories = [Category.objects.create(name=f'Benchmark similares {i}') for i in range(8)]
+        batch = []
+        for i in range(total):
+            title = ' '.join(rng.sample(WORDS, 2) + rng.sample(ADJECTIVES, 1))
+            description = ' '.join([title] + rng.choices(FILLER, k=25))
+            batch.append(Product(
+                title=title, description=description, price=1000 + i % 50000, seller=seller,
+                category=rng.choice(categories), condition='good', status='available',
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
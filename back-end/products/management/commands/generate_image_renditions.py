@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products.cache import CATALOG, bump_version
+from products.models import ProductImage
+from products.renditions import render_images
+
+
+def _init_worker():
+    """Inicializa Django en cada proceso del pool"""
+    import django
+    django.setup()
+
+
+def _render_batch(args):
+    image_ids, force = args
+    # Un solo incremento de la versión del catálogo al final, no uno por lote
+    return len(image_ids), render_images(image_ids, force=force, invalidate=False)
+
+
+class Command(BaseCommand):
+    help = 'Genera las versiones reducidas (WebP/JPEG) de las imágenes de productos que aún no las tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Procesos en paralelo (1 = en este proceso)')
+        parser.add_argument('--batch-size', type=int, default=50, help='Imágenes por tarea')
+        parser.add_argument('--all', action='store_true', help='Incluir imágenes que ya tienen versiones')
+        parser.add_argument('--force', action='store_true', help='Volver a escribir los archivos existentes')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = max(1, options['batch_size'])
+        started = time.monotonic()
+
+        images = ProductImage.objects.order_by('pk')
+        if not (options['all'] or options['force']):
+            images = images.filter(renditions={})
+        ids = list(images.values_list('pk', flat=True))
+        batches = [(ids[i:i + batch_size], options['force']) for i in range(0, len(ids), batch_size)]
+
+        pool = None
+        if workers > 1 and len(batches) > 1:
+            # Los procesos hijos no deben heredar conexiones abiertas a la base de datos
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+        total = done = 0
+        try:
+            results = pool.map(_render_batch, batches) if pool else map(_render_batch, batches)
+            for count, rendered in results:
+                total += count
+                done += rendered
+                self.stdout.write(f'{total}/{len(ids)} imágenes procesadas')
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+
+        if done:
+            bump_version(CATALOG)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Versiones generadas para {done} de {len(ids)} imágenes en {elapsed:.1f}s ({len(ids) - done} con error)'
+        ))
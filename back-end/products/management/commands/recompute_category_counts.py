@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from products.cache import CATEGORIES, bump_version
+from products.models import Category, CategoryProductCount
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero la cantidad de productos disponibles de cada categoría'
+
+    def handle(self, *args, **options):
+        # Una sola consulta agrupada con los totales reales por categoría
+        totals = dict(
+            Category.objects.annotate(
+                available=models.Count('products', filter=models.Q(products__status='available'))
+            ).values_list('id', 'available')
+        )
+        current = dict(CategoryProductCount.objects.values_list('category_id', 'available_products'))
+
+        fixed = [
+            CategoryProductCount(category_id=category_id, available_products=available)
+            for category_id, available in totals.items()
+            if current.get(category_id) != available
+        ]
+
+        with transaction.atomic():
+            CategoryProductCount.objects.bulk_create(
+                fixed,
+                update_conflicts=True,
+                unique_fields=['category'],
+                update_fields=['available_products'],
+            )
+        if fixed:
+            bump_version(CATEGORIES)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Conteos recalculados: {len(fixed)} categorías corregidas')
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.popularity import recompute_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula la popularidad de todos los productos desde sus visitas, favoritos y '
+        'conversaciones (corrige favoritos quitados y conversaciones borradas). Pensado para '
+        'ejecutarse periódicamente, por ejemplo una vez al día.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Productos por UPDATE')
+
+    def handle(self, *args, **options):
+        updated = recompute_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Popularidad recalculada para {updated} productos'))
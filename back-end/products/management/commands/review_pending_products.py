@@ -1,83 +1,120 @@
+from concurrent.futures import ProcessPoolExecutor
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from products.models import Product, ProductImage
-from products.utils import moderate_content
+from django.db import connections
+from products.review import APPROVED, CHANGES_REVERTED, DELETED, claim_due_products, review_product
+import json
 import logging
-import os
+import signal
+import time
 
 logger = logging.getLogger(__name__)
 
+
+def _init_worker():
+    """Inicializa Django en cada proceso del pool"""
+    import django
+    django.setup()
+
+
+def _review_one(product):
+    """Revisa un producto y devuelve (id, resultado, motivo). Se ejecuta en el pool o en el proceso principal"""
+    product_id = product.id
+    try:
+        outcome, reason = review_product(product)
+        return product_id, outcome, reason
+    except Exception as e:
+        logger.error(f"Error al revisar producto #{product_id}: {str(e)}")
+        return product_id, 'error', str(e)
+
+
 class Command(BaseCommand):
-    help = 'Revisa productos en estado pendiente que han esperado al menos 30 segundos'
+    help = 'Revisa productos pendientes cuyo tiempo de revisión programado ya ha pasado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Seguir esperando nuevos productos en lugar de terminar')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Segundos de espera entre consultas cuando la cola está vacía (modo --loop)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Número de procesos para revisar en paralelo')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Productos a obtener por consulta (con imágenes, vendedor y categoría)')
+        parser.add_argument('--max-runtime', type=float, default=None,
+                            help='Segundos tras los cuales terminar de forma ordenada (para reciclar el proceso)')
 
     def handle(self, *args, **options):
-        now = timezone.now()
-        
-        # Obtener productos pendientes cuyo tiempo de revisión programado ya ha pasado
-        pending_products = Product.objects.filter(
-            status='pending',
-            review_scheduled_at__lte=now
+        self.stopping = False
+        try:
+            signal.signal(signal.SIGINT, self.request_stop)
+            if hasattr(signal, 'SIGTERM'):
+                signal.signal(signal.SIGTERM, self.request_stop)
+        except ValueError:
+            pass  # call_command desde un hilo secundario: sin manejo de señales
+
+        workers = max(1, options['workers'])
+        batch_size = max(1, options['batch_size'])
+        started = time.monotonic()
+        deadline = started + options['max_runtime'] if options['max_runtime'] else None
+        stats = {'reviewed': 0, 'approved': 0, 'deleted': 0, 'changes_reverted': 0, 'errors': 0, 'batches': 0}
+
+        pool = None
+        if workers > 1:
+            # Los procesos hijos no deben heredar conexiones abiertas a la base de datos
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+        try:
+            while not self.stopping:
+                batch = self.claim_batch(batch_size)
+                if batch:
+                    stats['batches'] += 1
+                    results = pool.map(_review_one, batch) if pool else map(_review_one, batch)
+                    for product_id, outcome, reason in results:
+                        self.report(product_id, outcome, reason, stats)
+                elif not options['loop']:
+                    break
+
+                if deadline and time.monotonic() >= deadline:
+                    self.stdout.write("Tiempo máximo alcanzado, terminando")
+                    break
+                if not batch:
+                    time.sleep(options['interval'])
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+
+        elapsed = time.monotonic() - started
+        summary = dict(
+            stats,
+            workers=workers,
+            elapsed_seconds=round(elapsed, 3),
+            throughput_per_second=round(stats['reviewed'] / elapsed, 3) if elapsed > 0 else 0.0,
         )
-        
-        self.stdout.write(f"Encontrados {pending_products.count()} productos pendientes para revisar")
-        
-        for product in pending_products:
-            try:
-                self.stdout.write(f"Revisando producto #{product.id}: {product.title}")
-                
-                # Obtener rutas de imágenes
-                image_paths = []
-                for img in product.images.all():
-                    if os.path.exists(img.image.path):
-                        image_paths.append(img.image.path)
-                    else:
-                        logger.warning(f"Imagen no encontrada: {img.image.path}")
-                
-                if not image_paths:
-                    logger.warning(f"No se encontraron imágenes válidas para el producto #{product.id}")
-                    # Si no hay imágenes, marcar como no disponible
-                    product.status = 'unavailable'
-                    product.save(update_fields=['status'])
-                    continue                # Aplicar moderación inteligente con análisis de imágenes IA
-                from products.intelligent_moderator import moderate_product_with_ai
-                is_approved, rejection_reason = moderate_product_with_ai(product)
-                  if is_approved:
-                    logger.info(f"Producto #{product.id} aprobado")
-                    product.status = 'available'
-                    product.save(update_fields=['status'])
-                    self.stdout.write(self.style.SUCCESS(f"Producto #{product.id} aprobado y marcado como disponible"))
-                else:
-                    logger.warning(f"Producto #{product.id} rechazado: {rejection_reason}")
-                    
-                    # Guardar información del producto antes de eliminarlo para la notificación
-                    product_title = product.title
-                    product_seller = product.seller
-                    product_category_name = product.category.name if product.category else 'Varios'
-                    
-                    # Guardar producto y sus imágenes para eliminarlos
-                    product_images = list(product.images.all())
-                    image_paths = [img.image.path for img in product_images]
-                    
-                    # Eliminar el producto (lo que también eliminará las imágenes por CASCADE)
-                    product.delete()
-                    
-                    # Crear notificación al vendedor sobre el rechazo
-                    from notifications.signals import create_product_rejected_notification
-                    create_product_rejected_notification(product_seller, product_title, rejection_reason, product_category_name)
-                    
-                    # Intentar eliminar los archivos físicos de imágenes
-                    for path in image_paths:
-                        try:
-                            if os.path.exists(path):
-                                os.remove(path)
-                                logger.info(f"Imagen eliminada: {path}")
-                        except Exception as e:
-                            logger.error(f"Error al eliminar imagen {path}: {str(e)}")
-                    
-                    self.stdout.write(self.style.WARNING(f"Producto #{product.id} rechazado y eliminado: {rejection_reason}. Notificación enviada al vendedor."))
-                    
-            except Exception as e:
-                logger.error(f"Error al revisar producto #{product.id}: {str(e)}")
-                self.stdout.write(self.style.ERROR(f"Error al revisar producto #{product.id}: {str(e)}"))
-        
-        self.stdout.write(self.style.SUCCESS("Revisión de productos completada"))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS("Revisión de productos completada"))
+        self.stdout.write(json.dumps(summary))
+
+    def request_stop(self, signum, frame):
+        # Terminar después del lote actual
+        self.stopping = True
+
+    def claim_batch(self, batch_size):
+        """Reserva un lote de productos vencidos (ver products.review.claim_due_products)"""
+        return claim_due_products(batch_size)
+
+    def report(self, product_id, outcome, reason, stats):
+        stats['reviewed'] += 1
+        if outcome == APPROVED:
+            stats['approved'] += 1
+            self.stdout.write(self.style.SUCCESS(f"Producto #{product_id} aprobado"))
+        elif outcome == DELETED:
+            stats['deleted'] += 1
+            self.stdout.write(self.style.WARNING(f"Producto #{product_id} rechazado y eliminado: {reason}. Notificación enviada al vendedor."))
+        elif outcome == CHANGES_REVERTED:
+            stats['changes_reverted'] += 1
+            self.stdout.write(self.style.WARNING(
+                f"Cambios del producto #{product_id} rechazados: {reason}. La publicación sigue activa "
+                f"sin las imágenes nuevas. Notificación enviada al vendedor."
+            ))
+        else:
+            stats['errors'] += 1
+            self.stdout.write(self.style.ERROR(f"Error al revisar producto #{product_id}: {reason}"))
@@ -1,16 +1,27 @@
 import logging
-from django.utils import timezone
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 
 logger = logging.getLogger(__name__)
 
+# Productos revisados como máximo por petición (PRODUCT_REVIEW_MAX_PER_REQUEST); el resto
+# queda para las siguientes. Cada revisión puede llamar a la IA, así que el tope es bajo
+MAX_PRODUCTS_PER_REQUEST = 2
+
 class ProductReviewMiddleware:
     """
     Middleware que revisa automáticamente los productos pendientes
     que han estado en revisión por al menos 1 minuto.
+    Con PRODUCT_REVIEW_IN_REQUESTS=False (cuando corre el comando review_pending_products
+    como worker) no se instala y las peticiones no revisan nada.
     """
     
     def __init__(self, get_response):
+        if not getattr(settings, 'PRODUCT_REVIEW_IN_REQUESTS', True):
+            raise MiddlewareNotUsed('Las revisiones las hace el worker review_pending_products')
         self.get_response = get_response
+        self.max_products = getattr(settings, 'PRODUCT_REVIEW_MAX_PER_REQUEST', MAX_PRODUCTS_PER_REQUEST)
         
     def __call__(self, request):
         # Código ejecutado para cada solicitud antes de la vista
@@ -23,124 +34,18 @@ class ProductReviewMiddleware:
     def check_pending_products(self):
         try:
             # Importamos aquí para evitar importaciones circulares
-            from products.models import Product
-            from products.utils import moderate_content, validate_image_filenames
-            import os
+            from products.review import claim_due_products, review_product
             
-            # Obtener hora actual
-            now = timezone.now()
+            # Productos pendientes cuyo tiempo de revisión ya ha pasado, por prioridad. Se
+            # reservan antes de revisarlos: otra petición o el comando no los toman a la vez
+            pending_products = claim_due_products(self.max_products)
             
-            # Buscar productos pendientes cuyo tiempo de revisión ya ha pasado
-            pending_products = Product.objects.filter(
-                status='pending',
-                review_scheduled_at__lte=now
-            )
-            
-            if pending_products.exists():
-                logger.info(f"Revisando {pending_products.count()} productos pendientes...")
+            if pending_products:
+                logger.info(f"Revisando {len(pending_products)} productos pendientes...")
                 
                 for product in pending_products:
                     try:
-                        # Obtener rutas de imágenes
-                        image_paths = []
-                        for img in product.images.all():
-                            if os.path.exists(img.image.path):
-                                image_paths.append(img.image.path)
-                        
-                        if not image_paths:
-                            # Si no hay imágenes, eliminar el producto y notificar
-                            product_id = product.id
-                            product_title = product.title
-                            product_seller = product.seller
-                            reason = 'El producto no tiene imágenes válidas para analizar.'
-                            product_category_name = product.category.name if product.category else 'Varios'
-                            # Guardar imágenes para eliminarlas (aunque no existan físicamente)
-                            product_images = list(product.images.all())
-                            image_paths = [img.image.path for img in product_images]
-                            # Eliminar producto (lo que también eliminará las imágenes por CASCADE)
-                            product.delete()
-                            # Crear notificación al vendedor sobre el rechazo
-                            from notifications.signals import create_product_rejected_notification
-                            create_product_rejected_notification(product_seller, product_title, reason, product_category_name)
-                            # Intentar eliminar archivos físicos
-                            for path in image_paths:
-                                try:
-                                    if os.path.exists(path):
-                                        os.remove(path)
-                                except Exception as e:
-                                    logger.error(f"Error eliminando imagen {path}: {str(e)}")
-                            logger.warning(f"Producto #{product_id} eliminado por no tener imágenes válidas")
-                            continue
-                        
-                        # Obtener nombres de archivos de imágenes
-                        image_filenames = [os.path.basename(img.image.name) for img in product.images.all()]
-                          # Primero validar nombres de archivos
-                        filename_validation = validate_image_filenames(image_filenames)
-                        
-                        if not filename_validation['approved']:
-                            # Producto rechazado por nombre de archivo inapropiado
-                            product_id = product.id
-                            product_title = product.title
-                            product_seller = product.seller
-                            reason = filename_validation['reason']
-                            
-                            # Guardar imágenes para eliminarlas
-                            product_images = list(product.images.all())
-                            image_paths = [img.image.path for img in product_images]
-                            
-                            # Eliminar producto (lo que también eliminará las imágenes por CASCADE)
-                            product.delete()
-                              # Crear notificación al vendedor sobre el rechazo
-                            from notifications.signals import create_product_rejected_notification
-                            product_category_name = product.category.name if product.category else 'Varios'
-                            create_product_rejected_notification(product_seller, product_title, reason, product_category_name)
-                            
-                            # Intentar eliminar archivos físicos
-                            for path in image_paths:
-                                try:
-                                    if os.path.exists(path):
-                                        os.remove(path)
-                                except Exception as e:
-                                    logger.error(f"Error eliminando imagen {path}: {str(e)}")
-                                    
-                            logger.warning(f"Producto #{product_id} rechazado por nombre de archivo: {reason}")
-                            continue                        # Si los nombres de archivos son apropiados, proceder con análisis inteligente de IA
-                        from .intelligent_moderator import moderate_product_with_ai
-                        is_approved, rejection_reason = moderate_product_with_ai(product)
-                        
-                        if is_approved:# Producto aprobado
-                            product.status = 'available'
-                            product.save(update_fields=['status'])
-                            logger.info(f"Producto #{product.id} aprobado y disponible")
-                        else:
-                            # Producto rechazado - guardar información antes de eliminar
-                            product_id = product.id
-                            product_title = product.title
-                            product_seller = product.seller
-                            product_category_name = product.category.name if product.category else 'Varios'
-                            reason = rejection_reason
-                            
-                            # Guardar imágenes para eliminarlas
-                            product_images = list(product.images.all())
-                            image_paths = [img.image.path for img in product_images]
-                            
-                            # Eliminar producto (lo que también eliminará las imágenes por CASCADE)
-                            product.delete()
-                            
-                            # Crear notificación al vendedor sobre el rechazo
-                            from notifications.signals import create_product_rejected_notification
-                            create_product_rejected_notification(product_seller, product_title, reason, product_category_name)
-                            
-                            # Intentar eliminar archivos físicos
-                            for path in image_paths:
-                                try:
-                                    if os.path.exists(path):
-                                        os.remove(path)
-                                except Exception as e:
-                                    logger.error(f"Error eliminando imagen {path}: {str(e)}")
-                                    
-                            logger.warning(f"Producto #{product_id} rechazado y eliminado: {reason}")
-                    
+                        review_product(product)
                     except Exception as e:
                         logger.error(f"Error al revisar producto #{product.id}: {str(e)}")
                         
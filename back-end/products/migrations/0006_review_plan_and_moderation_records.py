@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_original_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='review_depth',
+            field=models.CharField(choices=[('fast', 'Texto y hashes de imágenes'), ('full', 'Análisis completo con IA')], default='full', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='risk_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ModerationRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_title', models.CharField(max_length=200)),
+                ('approved', models.BooleanField()),
+                ('reason', models.TextField(blank=True)),
+                ('review_depth', models.CharField(choices=[('fast', 'Texto y hashes de imágenes'), ('full', 'Análisis completo con IA')], default='full', max_length=10)),
+                ('risk_score', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderation_records', to='products.product')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moderation_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ModeratedImageHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('is_approved', models.BooleanField()),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_hashes', to='products.moderationrecord')),
+            ],
+        ),
+    ]
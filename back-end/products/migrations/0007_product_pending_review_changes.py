@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_review_plan_and_moderation_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='pending_review_changes',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE products_product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX products_product_search_vector_gin ON products_product USING GIN (search_vector)",
+    "CREATE INDEX products_product_title_trgm ON products_product USING GIN (title gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS products_product_title_trgm",
+    "DROP INDEX IF EXISTS products_product_search_vector_gin",
+    "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts "
+    "USING fts5(title, description, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO products_product_fts (rowid, title, description) "
+    "SELECT id, title, description FROM products_product",
+]
+
+SQLITE_REVERSE = [
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+
+def run_statements(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        run_statements(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        run_statements(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_pending_review_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
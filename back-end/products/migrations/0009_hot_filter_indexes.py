@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', '-created_at'], name='product_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'status', 'price'], name='product_cat_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['review_scheduled_at'], name='product_pending_review_idx'),
+        ),
+    ]
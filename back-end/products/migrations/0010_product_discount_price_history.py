@@ -0,0 +1,71 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:12
+
+import django.db.models.deletion
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_discounts(apps, schema_editor):
+    """Descuento de los productos que ya bajaron de precio; se toma updated_at como fecha de la baja"""
+    Product = apps.get_model('products', 'Product')
+    discounted = Product.objects.filter(original_price__gt=models.F('price')).only(
+        'id', 'price', 'original_price', 'updated_at'
+    )
+    batch = []
+    for product in discounted.iterator(chunk_size=1000):
+        discount = (product.original_price - product.price) * 100 / product.original_price
+        product.discount_pct = discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        product.discounted_at = product.updated_at
+        batch.append(product)
+        if len(batch) == 1000:
+            Product.objects.bulk_update(batch, ['discount_pct', 'discounted_at'])
+            batch = []
+    Product.objects.bulk_update(batch, ['discount_pct', 'discounted_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='discount_pct',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='discounted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('discount_pct__gt', 0)), fields=['-discount_pct', 'discounted_at'], name='product_discount_idx'),
+        ),
+        migrations.AddField(
+            model_name='pricechange',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_changes', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='pricechange',
+            index=models.Index(fields=['product', '-changed_at'], name='pricechange_product_idx'),
+        ),
+        migrations.RunPython(backfill_discounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:15
+
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Copia fija de products/popularity.py al momento de esta migración: los cambios
+# posteriores de ese módulo no deben alterar lo que hace una migración ya aplicada
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+WEIGHTS = {'publish': 10.0, 'view': 1.0, 'favorite': 5.0, 'conversation': 8.0}
+
+
+def event_score(weight, at):
+    # Misma escala que en ejecución: la vida media sigue saliendo de settings
+    rate = math.log(2) / getattr(settings, 'PRODUCT_POPULARITY_HALF_LIFE_HOURS', 72)
+    return math.log(weight) + rate * (at - EPOCH).total_seconds() / 3600
+
+
+def combine(scores):
+    top = max(scores)
+    return top + math.log(sum(math.exp(score - top) for score in scores))
+
+
+def backfill_popularity(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Favorite = apps.get_model('products', 'Favorite')
+    Conversation = apps.get_model('chat', 'Conversation')
+
+    now = timezone.now()
+    events = defaultdict(list)
+    for product_id, created_at in Favorite.objects.values_list('product_id', 'created_at').iterator():
+        events[product_id].append(event_score(WEIGHTS['favorite'], created_at))
+    for product_id, created_at in Conversation.objects.values_list('product_id', 'created_at').iterator():
+        events[product_id].append(event_score(WEIGHTS['conversation'], created_at))
+
+    batch = []
+    for product in Product.objects.only('id', 'created_at', 'views_count').iterator(chunk_size=1000):
+        scores = events.pop(product.pk, [])
+        scores.append(event_score(WEIGHTS['publish'], product.created_at))
+        if product.views_count > 0:
+            middle = product.created_at + (now - product.created_at) / 2
+            scores.append(event_score(WEIGHTS['view'] * product.views_count, middle))
+        product.popularity_score = combine(scores)
+        batch.append(product)
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ['popularity_score'])
+            batch = []
+    Product.objects.bulk_update(batch, ['popularity_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_message_message_conv_read_sender_idx'),
+        ('products', '0010_product_discount_price_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popularity_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', '-popularity_score'], name='product_status_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'status', '-popularity_score'], name='product_cat_popular_idx'),
+        ),
+        migrations.RunPython(backfill_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    CategoryProductCount = apps.get_model('products', 'CategoryProductCount')
+    counts = Category.objects.annotate(
+        available=models.Count('products', filter=models.Q(products__status='available'))
+    ).values_list('id', 'available')
+    CategoryProductCount.objects.bulk_create([
+        CategoryProductCount(category_id=category_id, available_products=available)
+        for category_id, available in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_popularity_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryProductCount',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='product_count', serialize=False, to='products.category')),
+                ('available_products', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
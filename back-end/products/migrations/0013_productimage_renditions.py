@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_category_product_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_productimage_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('namespace', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+                ('modified_at', models.DateTimeField()),
+            ],
+        ),
+    ]
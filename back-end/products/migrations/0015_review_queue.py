@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+def clear_finished_reviews(apps, schema_editor):
+    """review_scheduled_at ahora marca la cola: se borra en los productos ya revisados"""
+    Product = apps.get_model('products', 'Product')
+    Product.objects.exclude(status='pending').filter(
+        pending_review_changes__isnull=True, review_scheduled_at__isnull=False,
+    ).update(review_scheduled_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_cache_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_finished_reviews, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_pending_review_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('review_scheduled_at__isnull', False)), fields=['review_scheduled_at'], name='product_review_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def clear_non_image_rejections(apps, schema_editor):
+    """
+    Antes se guardaban como rechazadas todas las imágenes de cualquier producto rechazado,
+    también por texto o precio. Se conservan solo las de rechazos por contenido de imagen.
+    """
+    ModeratedImageHash = apps.get_model('products', 'ModeratedImageHash')
+    ModeratedImageHash.objects.filter(is_approved=False).exclude(
+        record__reason__contains='Imagen inapropiada detectada por IA'
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_review_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_non_image_rejections, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
 import datetime
+from decimal import ROUND_HALF_UP, Decimal
 import os
 import logging
 from .utils import moderate_content
@@ -22,6 +25,10 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def _as_decimal(value):
+    """Precio como Decimal exacto aunque venga como int o float (None se mantiene)"""
+    return None if value is None else Decimal(str(value))
+
 class Product(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -41,6 +48,8 @@ class Product(models.Model):
         ('available', 'Disponible'),
         ('unavailable', 'No disponible'),
     ]
+    # Estados visibles para otros usuarios (todos menos 'pending'), como lista para usar el índice de estado
+    PUBLIC_STATUSES = ('available', 'unavailable')
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -50,14 +59,190 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_available = models.BooleanField(default=True)
     views_count = models.IntegerField(default=0)
-    # Campo para controlar cuando un producto debe ser revisado
+    # Cuándo revisar el producto; None cuando no hay revisión pendiente
     review_scheduled_at = models.DateTimeField(null=True, blank=True)
     # Campo para registrar si el producto fue modificado por el usuario manualmente
     manually_unavailable = models.BooleanField(default=False)
+    # Plan de revisión calculado por el evaluador de riesgo (products.risk)
+    REVIEW_DEPTH_CHOICES = [
+        ('fast', 'Texto y hashes de imágenes'),
+        ('full', 'Análisis completo con IA'),
+    ]
+    review_priority = models.IntegerField(default=0)
+    review_depth = models.CharField(max_length=10, choices=REVIEW_DEPTH_CHOICES, default='full')
+    risk_score = models.FloatField(null=True, blank=True)
+    # Cambios acumulados por ediciones que esperan una re-revisión: {'fields': [...], 'images': [...], 'since': iso}
+    pending_review_changes = models.JSONField(null=True, blank=True)
+    # Descuento vigente respecto de original_price y momento de la última baja de precio;
+    # se mantienen al guardar (ver save) para filtrar y ordenar ofertas sin calcularlas
+    discount_pct = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    discounted_at = models.DateTimeField(null=True, blank=True)
+    # Popularidad con decaimiento exponencial, en escala logarítmica (ver products.popularity)
+    popularity_score = models.FloatField(default=0)
+
+    PRICE_FIELDS = ('price', 'original_price')
+    DISCOUNT_FIELDS = ('discount_pct', 'discounted_at')
+
+    class Meta:
+        indexes = [
+            # Listado público: estado + más recientes primero
+            models.Index(fields=['status', '-created_at'], name='product_status_created_idx'),
+            # Filtros de ProductFilter: categoría + estado + rango de precio
+            models.Index(fields=['category', 'status', 'price'], name='product_cat_status_price_idx'),
+            # Cola de revisión (products.review.get_due_products): solo productos con una
+            # revisión pendiente, nuevos o re-revisiones de productos publicados
+            models.Index(
+                fields=['review_scheduled_at'],
+                condition=models.Q(review_scheduled_at__isnull=False),
+                name='product_review_queue_idx',
+            ),
+            # Ofertas: "descuento >= X en los últimos Y días", solo productos con descuento
+            models.Index(
+                fields=['-discount_pct', 'discounted_at'],
+                condition=models.Q(discount_pct__gt=0),
+                name='product_discount_idx',
+            ),
+            # Tendencias: más populares del catálogo y de cada categoría
+            models.Index(fields=['status', '-popularity_score'], name='product_status_popular_idx'),
+            models.Index(fields=['category', 'status', '-popularity_score'], name='product_cat_popular_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores tal como se cargaron, para que los signals sepan qué cambió al guardar
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self, fields):
+        """Campos de `fields` cuyo valor difiere del cargado (todos si no hay información)"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return set(fields)
+        return {
+            field for field in fields
+            if field not in loaded or getattr(self, field) != loaded[field]
+        }
+
+    def update_discount(self, previous_price=None, now=None):
+        """
+        Recalcula discount_pct y discounted_at a partir de price y original_price.
+        discounted_at marca la última baja de precio y se borra si ya no hay descuento.
+        """
+        # Los precios pueden venir como int o float (por ejemplo, Product(price=1000)) hasta guardarse
+        price = _as_decimal(self.price)
+        original_price = _as_decimal(self.original_price) or None
+        previous_price = _as_decimal(previous_price)
+        if original_price and price is not None and price < original_price:
+            discount = (original_price - price) * 100 / original_price
+            self.discount_pct = discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        else:
+            self.discount_pct = Decimal('0')
+        if not self.discount_pct:
+            self.discounted_at = None
+        elif previous_price is None or price < previous_price or self.discounted_at is None:
+            self.discounted_at = now or timezone.now()
+
+    def _saved_fields(self, update_fields):
+        """Columnas que escribirá save(): update_fields, o las cargadas si la instancia tiene campos diferidos"""
+        if update_fields is not None:
+            return {self._meta.get_field(name).attname for name in update_fields}
+        fields = {field.attname for field in self._meta.concrete_fields}
+        if not self._state.adding:
+            fields -= self.get_deferred_fields()
+        return fields
+
+    def _stored_price_values(self):
+        """Precios guardados en la base de datos, desde los valores cargados o con una consulta si faltan"""
+        loaded = getattr(self, '_loaded_values', None) or {}
+        if all(field in loaded for field in self.PRICE_FIELDS):
+            return {field: loaded[field] for field in self.PRICE_FIELDS}
+        stored = Product.objects.filter(pk=self.pk).values(*self.PRICE_FIELDS).first()
+        return stored or dict.fromkeys(self.PRICE_FIELDS)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        saved_fields = self._saved_fields(update_fields)
+        adding = self._state.adding
+        price_changed = False
+        previous_price = None
+
+        if set(self.PRICE_FIELDS) & saved_fields:
+            if adding:
+                price_changed = True
+            else:
+                stored = self._stored_price_values()
+                previous_price = stored['price']
+                price_changed = any(
+                    _as_decimal(getattr(self, field)) != _as_decimal(stored[field])
+                    for field in self.PRICE_FIELDS if field in saved_fields
+                )
+
+        if adding and not self.popularity_score:
+            from .popularity import WEIGHTS, event_score
+
+            self.popularity_score = event_score(WEIGHTS['publish'])
+        if price_changed:
+            self.update_discount(previous_price)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.DISCOUNT_FIELDS)
+        super().save(*args, **kwargs)
+
+        if price_changed and (previous_price is None or _as_decimal(previous_price) != _as_decimal(self.price)):
+            PriceChange.objects.create(product=self, old_price=previous_price, new_price=self.price)
+        # Los signals de post_save ya compararon contra los valores anteriores: desde aquí
+        # la referencia son los valores recién guardados
+        self._remember_saved_values(self._saved_fields(kwargs.get('update_fields')))
+
+    def _remember_saved_values(self, fields):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+        loaded.update({field: getattr(self, field) for field in fields})
+
+class CategoryProductCount(models.Model):
+    """
+    Productos disponibles por categoría, mantenidos con UPDATE ... F() en cada cambio de
+    estado o categoría (ver products/signals.py y products/bulk.py). El comando
+    recompute_category_counts los recalcula desde cero.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='product_count')
+    available_products = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category_id}: {self.available_products}"
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Suma {id de categoría: diferencia} a los contadores, creando los que falten"""
+        deltas = {category_id: delta for category_id, delta in deltas.items() if category_id is not None and delta}
+        for category_id, delta in deltas.items():
+            # Nunca bajo cero aunque el contador se haya desviado (recompute_category_counts lo corrige)
+            value = Greatest(F('available_products') + delta, 0)
+            if not cls.objects.filter(category_id=category_id).update(available_products=value):
+                cls.objects.get_or_create(category_id=category_id)
+                cls.objects.filter(category_id=category_id).update(available_products=value)
+        return bool(deltas)
+
+class PriceChange(models.Model):
+    """Historial de precios: una fila por cada precio que toma un producto (old_price vacío al publicarlo)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_changes')
+    old_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['product', '-changed_at'], name='pricechange_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} -> {self.new_price}"
+
 def validate_image(image):
     # Temporarily make validation less strict for debugging
     # Validar tamaño máximo (10MB en lugar de 5MB)
@@ -75,6 +260,8 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='product_images/', validators=[validate_image])  # Usar storage por defecto
     is_primary = models.BooleanField(default=False)
+    # Versiones reducidas WebP/JPEG por ancho, generadas en segundo plano (ver products.renditions)
+    renditions = models.JSONField(default=dict, blank=True)
 
     def save(self, *args, **kwargs):
         logger.info(f"[DEBUG] Guardando ProductImage: type(image)={type(self.image)}, name={getattr(self.image, 'name', None)}")
@@ -90,29 +277,87 @@ class Favorite(models.Model):
     
     class Meta:
         unique_together = ('user', 'product')
+        indexes = [
+            # Lista de favoritos del usuario, más recientes primero
+            models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} favorited {self.product.title}"
 
+class ModerationRecord(models.Model):
+    """Resultado almacenado de cada revisión, usado para calcular el riesgo del vendedor"""
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='moderation_records')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='moderation_records')
+    product_title = models.CharField(max_length=200)
+    approved = models.BooleanField()
+    reason = models.TextField(blank=True)
+    review_depth = models.CharField(max_length=10, choices=Product.REVIEW_DEPTH_CHOICES, default='full')
+    risk_score = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{'Aprobado' if self.approved else 'Rechazado'}: {self.product_title}"
+
+class ModeratedImageHash(models.Model):
+    """Hash de una imagen revisada, para detectar imágenes ya rechazadas sin volver a usar IA"""
+    record = models.ForeignKey(ModerationRecord, on_delete=models.CASCADE, related_name='image_hashes')
+    content_hash = models.CharField(max_length=64, db_index=True)
+    is_approved = models.BooleanField()
+
+    def __str__(self):
+        return self.content_hash
+
+class CacheVersion(models.Model):
+    """
+    Versión de un espacio de nombres de la caché del catálogo (ver products/cache.py).
+    Vive en la base de datos para que todos los procesos (web, comandos, workers) vean
+    el mismo valor aunque la caché sea local a cada proceso.
+    """
+    namespace = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+    modified_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.namespace}: v{self.version}"
+
 @receiver(post_save, sender=Product)
 def product_post_save(sender, instance, created, **kwargs):
     """
     Signal para programar la moderación automática cuando se crea un producto.
-    El producto se mantiene en estado 'pending' durante al menos 30 segundos antes de ser revisado.
+    La prioridad, la espera y la profundidad del análisis dependen del riesgo
+    estimado del vendedor y del contenido (ver products.risk).
     """
     if created and instance.status == 'pending':
         logger.info(f"Producto #{instance.id} creado: {instance.title}")
-        
-        # Programar la revisión para 30 segundos después de la creación
-        review_time = timezone.now() + datetime.timedelta(seconds=30)
-        
-        # Actualizar el tiempo de revisión programado
-        # Usar update() para evitar que se active de nuevo este signal
-        Product.objects.filter(pk=instance.pk).update(review_scheduled_at=review_time)
-        
-        logger.info(f"Revisión programada para {review_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        # Planificar al confirmar la transacción: así el plan ve las imágenes creadas junto
+        # con el producto y un producto revertido nunca entra a la cola de revisión
+        transaction.on_commit(lambda: schedule_initial_review(instance))
         
     # No ejecutamos la moderación inmediatamente - será realizada por el middleware
 
+
+def schedule_initial_review(instance):
+    from .risk import plan_product_review
+    plan = plan_product_review(instance)
+    review_time = timezone.now() + datetime.timedelta(seconds=plan.delay_seconds)
+    
+    # Actualizar el plan de revisión
+    # Usar update() para evitar que se active de nuevo este signal
+    Product.objects.filter(pk=instance.pk).update(
+        review_scheduled_at=review_time,
+        review_priority=plan.priority,
+        review_depth=plan.depth,
+        risk_score=plan.risk_score,
+    )
+    
+    logger.info(
+        f"Revisión programada para {review_time.strftime('%Y-%m-%d %H:%M:%S')} "
+        f"(riesgo={plan.risk_score}, profundidad={plan.depth}, prioridad={plan.priority})"
+    )
+
 # Asegurarse de que este código se carga al inicio
 default_app_config = 'products.apps.ProductsConfig'
\ No newline at end of file
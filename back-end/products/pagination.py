@@ -1,13 +1,183 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre el orden activo del queryset más el id.
+
+    En lugar de OFFSET filtra por "después de los valores del último elemento", así que
+    el costo de una página no depende de su profundidad y los productos nuevos no
+    desplazan los resultados. El cursor es opaco (JSON en base64) y el COUNT(*) solo
+    se calcula si se pide con ?with_count=1.
+
+    Los campos de orden deben ser columnas o anotaciones no nulas.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering) or ['-pk']
+        if not all(isinstance(field, str) for field in ordering):
+            return None
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            # Desempate estable en la misma dirección que el primer campo
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(queryset)
+        if ordering is None:
+            return None
+
+        self.request = request
+        self.ordering = ordering
+        position, self.reverse = self.decode_cursor(request, queryset)
+
+        if self.reverse:
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+        page_queryset = queryset.order_by(*ordering)
+        if position is not None:
+            page_queryset = page_queryset.filter(self.position_filter(ordering, position))
+
+        results = list(page_queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.count = queryset.count() if request.query_params.get(self.count_query_param) else None
+        self.page = results
+        return results
+
+    def position_filter(self, ordering, position):
+        """(a, b, id) > (va, vb, vid) respetando la dirección de cada campo"""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{name}__{lookup}': position[i]})
+            for previous, value in zip(ordering[:i], position[:i]):
+                term &= Q(**{previous.lstrip('-'): value})
+            condition |= term
+        return condition
+
+    def get_position(self, instance):
+        values = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            if isinstance(value, (datetime.datetime, datetime.date)):
+                value = value.isoformat()
+            elif isinstance(value, decimal.Decimal):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_output_field(self, queryset, name):
+        """Campo del modelo (o anotación) de un campo de orden, siguiendo relaciones con __"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        model = queryset.model
+        *relations, last = name.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.pk if last == 'pk' else model._meta.get_field(last)
+
+    def decode_cursor(self, request, queryset):
+        """
+        Posición y dirección del cursor. Cada valor se convierte al tipo de su campo:
+        un cursor alterado responde 404 en lugar de fallar al ejecutar la consulta.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = []
+            for field, value in zip(self.ordering, position):
+                if value is None or isinstance(value, (list, dict)):
+                    raise ValidationError(self.invalid_cursor_message)
+                values.append(self.get_output_field(queryset, field.lstrip('-')).to_python(value))
+        except (ValidationError, FieldDoesNotExist, TypeError, ValueError, decimal.InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Página vacía al retroceder: volver al inicio
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.cursor_query_param, '')
+        return self.encode_cursor(self.get_position(self.page[0]), True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 12  # tamaño por defecto
     page_size_query_param = 'page_size'  # permite personalizar el tamaño
     max_page_size = 100  # máximo 100 productos por página
+    # Con ?cursor= (vacío para la primera página) se usa paginación por cursor (ver KeysetPagination)
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            keyset = KeysetPagination(self.get_page_size(request))
+            page = keyset.paginate_queryset(queryset, request, view)
+            if page is not None:
+                self.keyset = keyset
+                return page
+            # Orden no compatible con cursor (expresiones en order_by): se responde con
+            # paginación por número de página
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
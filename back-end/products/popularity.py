@@ -0,0 +1,114 @@
+"""
+Popularidad con decaimiento exponencial (Product.popularity_score).
+
+Cada evento (publicación, visitas, favorito, conversación iniciada) aporta su peso
+multiplicado por exp(-λ·antigüedad), con λ = ln 2 / PRODUCT_POPULARITY_HALF_LIFE_HOURS.
+En lugar de envejecer todas las filas periódicamente se usa decaimiento "hacia
+adelante": el evento del instante t suma peso·exp(λ·(t - EPOCH)), que ordena igual
+que el valor decaído a cualquier fecha. Para que ese valor no crezca sin límite, la
+columna guarda su logaritmo, y sumar un evento es logaddexp(score, ln(peso) + λ·(t - EPOCH)),
+un UPDATE con F() que no necesita leer la fila.
+
+La suma es incremental (vistas al vaciar el contador, favoritos y conversaciones al
+crearse) y el comando recompute_popularity la recalcula desde los datos, lo que
+también descuenta favoritos quitados y conversaciones borradas.
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+WEIGHTS = {
+    'publish': 10.0,
+    'view': 1.0,
+    'favorite': 5.0,
+    'conversation': 8.0,
+}
+
+# Diferencias mayores no cambian logaddexp en float64 (y exp() de PostgreSQL falla por underflow)
+MAX_EXP_GAP = 50.0
+
+
+def decay_rate():
+    """λ por hora"""
+    return math.log(2) / getattr(settings, 'PRODUCT_POPULARITY_HALF_LIFE_HOURS', 72)
+
+
+def event_score(weight, at=None):
+    """ln(peso) + λ·(t - EPOCH): aporte de un evento en la escala de popularity_score"""
+    at = at or timezone.now()
+    hours = (at - EPOCH).total_seconds() / 3600
+    return math.log(weight) + decay_rate() * hours
+
+
+def combine(scores):
+    """logsumexp en Python, para recalcular desde los datos"""
+    scores = list(scores)
+    if not scores:
+        return 0.0
+    top = max(scores)
+    return top + math.log(sum(math.exp(score - top) for score in scores))
+
+
+def add_score(value):
+    """Expresión logaddexp(popularity_score, value) para update()"""
+    current = F('popularity_score')
+    gap = Least(Abs(current - value), Value(MAX_EXP_GAP))
+    return Greatest(current, value) + Ln(Value(1.0) + Exp(-gap), output_field=FloatField())
+
+
+def record_event(product_id, kind, count=1, at=None):
+    """Suma un evento (o `count` iguales) a la popularidad de un producto, sin signals"""
+    from .models import Product
+
+    score = event_score(WEIGHTS[kind] * count, at)
+    Product.objects.filter(pk=product_id).update(popularity_score=add_score(Value(score)))
+
+
+def trending_score(score, now=None):
+    """Valor decaído a `now` (puntos equivalentes de hoy), para mostrar o comparar con umbrales"""
+    return math.exp(score - event_score(1.0, now))
+
+
+def recompute_scores(batch_size=1000):
+    """
+    Recalcula popularity_score de todos los productos desde created_at, views_count,
+    favoritos y conversaciones. Las visitas solo tienen total, así que se ubican en el
+    punto medio entre la publicación y ahora. Devuelve cuántos productos se actualizaron.
+    """
+    from chat.models import Conversation
+    from .models import Favorite, Product
+
+    now = timezone.now()
+    events = defaultdict(list)
+    for product_id, created_at in Favorite.objects.values_list('product_id', 'created_at').iterator():
+        events[product_id].append(event_score(WEIGHTS['favorite'], created_at))
+    for product_id, created_at in Conversation.objects.values_list('product_id', 'created_at').iterator():
+        events[product_id].append(event_score(WEIGHTS['conversation'], created_at))
+
+    updated = 0
+    batch = []
+    products = Product.objects.only('id', 'created_at', 'views_count', 'popularity_score')
+    for product in products.iterator(chunk_size=batch_size):
+        scores = events.pop(product.pk, [])
+        scores.append(event_score(WEIGHTS['publish'], product.created_at))
+        if product.views_count > 0:
+            middle = product.created_at + (now - product.created_at) / 2
+            scores.append(event_score(WEIGHTS['view'] * product.views_count, middle))
+        product.popularity_score = combine(scores)
+        batch.append(product)
+        if len(batch) >= batch_size:
+            Product.objects.bulk_update(batch, ['popularity_score'])
+            updated += len(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['popularity_score'])
+        updated += len(batch)
+    return updated
@@ -0,0 +1,181 @@
+"""
+Versiones reducidas (renditions) de las imágenes de productos.
+
+Por cada imagen se generan copias WebP y JPEG a los anchos de
+PRODUCT_IMAGE_RENDITION_WIDTHS (sin ampliar las imágenes más angostas), con nombres
+deterministas derivados del nombre completo del original (con su extensión):
+product_images/renditions/<archivo original>_<ancho>w.<ext>. Regenerar una imagen
+reutiliza los archivos ya escritos, así que el relleno de imágenes antiguas (comando
+generate_image_renditions) se puede repetir sin duplicar; al borrar una ProductImage
+se borran también sus versiones (ver products/signals.py), para que un nombre de
+original liberado y reutilizado no herede versiones de otra imagen.
+
+Las rutas quedan en ProductImage.renditions ({'webp': {'160': ruta, ...}, 'jpeg': {...}})
+y los serializers las entregan como mapa ancho -> URL para srcset. Las imágenes nuevas
+se procesan en segundo plano, en un pool de hilos, después del commit que las crea;
+mientras tanto (o si falla) las respuestas solo traen el original.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import CATALOG, bump_version
+from .models import ProductImage
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'product_images/renditions'
+# Formato -> (formato de Pillow, extensión, opciones de guardado)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_widths():
+    return sorted(getattr(settings, 'PRODUCT_IMAGE_RENDITION_WIDTHS', (160, 480, 1080)))
+
+
+def rendition_name(original_name, width, extension):
+    """
+    Nombre determinista de una versión: depende del archivo original (nombre completo,
+    para que foto.jpg y foto.png no compartan versiones), el ancho y el formato.
+    """
+    return f'{RENDITIONS_DIR}/{os.path.basename(original_name)}_{width}w.{extension}'
+
+
+def delete_renditions(renditions, storage):
+    """Borra del storage los archivos de ProductImage.renditions"""
+    for paths in (renditions or {}).values():
+        for path in paths.values():
+            try:
+                storage.delete(path)
+            except Exception as e:
+                logger.error(f'Error eliminando la versión {path}: {e}')
+
+
+def _flatten(image):
+    # JPEG no admite transparencia: se compone sobre fondo blanco
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_image(image, force=False):
+    """
+    Genera (o reutiliza) las versiones de una ProductImage, guarda sus rutas y las devuelve
+    (vacías si la imagen ya no existe; en ese caso se borran los archivos).
+    No usa save() para no disparar signals ni tocar el archivo original.
+    force: vuelve a generar aunque los archivos ya existan (por ejemplo, al cambiar la calidad).
+    """
+    storage = image.image.storage
+    widths = rendition_widths()
+    renditions = {name: {} for name in FORMATS}
+    pending = []
+    for width in widths:
+        for name, (_, extension, _) in FORMATS.items():
+            path = rendition_name(image.image.name, width, extension)
+            renditions[name][str(width)] = path
+            if force or not storage.exists(path):
+                pending.append((width, name, path))
+
+    if pending:
+        with image.image.open('rb') as original:
+            source = Image.open(original)
+            # JPEG: decodificar directamente a una escala menor cuando el ancho mayor lo permite
+            source.draft('RGB', (widths[-1], widths[-1] * source.height // max(source.width, 1)))
+            source = ImageOps.exif_transpose(source)
+            source.load()
+
+        resized = {}
+        for width, name, path in pending:
+            if width not in resized:
+                target = min(width, source.width)
+                height = max(1, round(source.height * target / source.width))
+                resized[width] = source.resize((target, height), Image.LANCZOS) if target != source.width else source
+            frame = resized[width]
+            pil_format, _, options = FORMATS[name]
+            if pil_format == 'JPEG':
+                frame = _flatten(frame)
+            elif frame.mode not in ('RGB', 'RGBA'):
+                frame = frame.convert('RGBA' if 'transparency' in frame.info else 'RGB')
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+            if force and storage.exists(path):
+                storage.delete(path)
+            saved = storage.save(path, ContentFile(buffer.getvalue()))
+            if saved != path:
+                # Otro proceso escribió el mismo archivo a la vez: se usa el nombre determinista
+                storage.delete(saved)
+
+    if not ProductImage.objects.filter(pk=image.pk).update(renditions=renditions):
+        # La imagen se borró mientras se generaban sus versiones: su signal ya no las verá
+        delete_renditions(renditions, storage)
+        return {}
+    image.renditions = renditions
+    return renditions
+
+
+def render_images(image_ids, force=False, invalidate=True):
+    """Procesa varias imágenes por id; las que fallan se registran y quedan solo con el original"""
+    done = 0
+    for image in ProductImage.objects.filter(pk__in=image_ids).only('id', 'image'):
+        try:
+            if render_image(image, force):
+                done += 1
+        except Exception as e:
+            logger.error(f'Error generando versiones de la imagen #{image.pk} ({image.image.name}): {e}')
+    if done and invalidate:
+        # Las respuestas cacheadas del catálogo deben incluir las nuevas URLs
+        bump_version(CATALOG)
+    return done
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'PRODUCT_IMAGE_RENDITION_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='renditions')
+        return _executor
+
+
+def _run_in_background(image_ids):
+    try:
+        render_images(image_ids)
+    finally:
+        # Cada hilo del pool abre sus propias conexiones; se liberan al terminar cada trabajo
+        connections.close_all()
+
+
+def schedule_renditions(image_ids):
+    """
+    Encola la generación de versiones para después del commit actual (las filas y los
+    archivos originales deben existir). Con PRODUCT_IMAGE_RENDITIONS_ASYNC=False se
+    ejecuta en el mismo hilo, por ejemplo en pruebas.
+    """
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+
+    def submit():
+        if getattr(settings, 'PRODUCT_IMAGE_RENDITIONS_ASYNC', True):
+            _get_executor().submit(_run_in_background, image_ids)
+        else:
+            render_images(image_ids)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,325 @@
+"""
+Revisión de productos pendientes compartida por el middleware y el comando
+review_pending_products.
+"""
+
+import datetime
+import logging
+import os
+from typing import Iterable, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import CATALOG, bump_version
+from .models import ModeratedImageHash, ModerationRecord, Product, ProductImage
+from .risk import compute_image_hash
+
+logger = logging.getLogger(__name__)
+
+# Tiempo durante el cual un producto tomado para revisión no se vuelve a tomar (ni en
+# el comando ni en el middleware). Si el proceso muere, el producto vuelve a la cola.
+CLAIM_LEASE_SECONDS = 300
+
+# Resultado de review_product
+APPROVED = 'approved'
+DELETED = 'deleted'                    # producto nuevo rechazado y eliminado
+CHANGES_REVERTED = 'changes_reverted'  # re-revisión rechazada: se quitan las imágenes nuevas
+
+
+def get_due_products(now=None):
+    """
+    Productos con una revisión vencida, ordenados por prioridad: productos nuevos
+    (status='pending') y re-revisiones de productos publicados, que siguen visibles.
+    review_scheduled_at solo tiene valor mientras hay una revisión pendiente.
+    """
+    now = now or timezone.now()
+    return Product.objects.filter(
+        review_scheduled_at__isnull=False,
+        review_scheduled_at__lte=now
+    ).order_by('-review_priority', 'review_scheduled_at')
+
+
+def claim_due_products(limit, now=None, lease_seconds=CLAIM_LEASE_SECONDS):
+    """
+    Reserva hasta `limit` productos vencidos y los devuelve con vendedor, categoría e
+    imágenes. Cada reserva es un UPDATE condicional (la revisión sigue vencida) que mueve
+    review_scheduled_at al fin del plazo: si otro proceso lo reservó primero, el UPDATE
+    no afecta filas y el producto se descarta, así que nunca se revisa dos veces.
+    """
+    now = now or timezone.now()
+    lease_until = now + datetime.timedelta(seconds=lease_seconds)
+    claimed = [
+        product_id
+        for product_id in get_due_products(now).values_list('pk', flat=True)[:limit]
+        if Product.objects.filter(
+            pk=product_id, review_scheduled_at__lte=now
+        ).update(review_scheduled_at=lease_until)
+    ]
+    if not claimed:
+        return []
+    return list(
+        Product.objects.filter(pk__in=claimed)
+        .select_related('seller', 'category')
+        .prefetch_related('images')
+        .order_by('-review_priority', 'pk')
+    )
+
+
+def record_moderation_outcome(product, approved, reason, image_hashes=None):
+    """
+    Guarda el resultado de la revisión para el historial de riesgo del vendedor.
+    image_hashes: en una aprobación, todas las imágenes; en un rechazo, solo las que la
+    IA marcó (la vía rápida rechaza cualquier producto que reutilice esas fotos).
+    """
+    try:
+        record = ModerationRecord.objects.create(
+            seller=product.seller,
+            product=product,
+            product_title=product.title,
+            approved=approved,
+            reason=reason or '',
+            review_depth=product.review_depth,
+            risk_score=product.risk_score,
+        )
+        if image_hashes:
+            ModeratedImageHash.objects.bulk_create([
+                ModeratedImageHash(record=record, content_hash=h, is_approved=approved)
+                for h in set(image_hashes)
+            ])
+        return record
+    except Exception as e:
+        logger.error(f"Error guardando resultado de moderación del producto #{product.id}: {str(e)}")
+        return None
+
+
+def notify_review_completed(product, new_status, record, approved=None):
+    """Programa el evento de revisión completada para después del commit"""
+    from notifications.signals import send_product_review_completed
+
+    seller_id = product.seller_id
+    product_id = product.id
+    product_title = product.title
+    verdict = {
+        'approved': new_status != 'rejected' if approved is None else approved,
+        'reason': record.reason if record else '',
+        'review_depth': product.review_depth,
+        'risk_score': product.risk_score,
+        'moderation_record_id': record.id if record else None,
+        'reviewed_at': (record.created_at if record else timezone.now()).isoformat(),
+    }
+    transaction.on_commit(
+        lambda: send_product_review_completed(seller_id, product_id, product_title, new_status, verdict)
+    )
+
+
+def reject_product(product, reason, image_hashes=None):
+    """
+    Elimina un producto nuevo rechazado, sus archivos, y notifica al vendedor. En una
+    re-revisión de un producto ya publicado solo se descartan los cambios pendientes
+    (ver reject_changes): la publicación aprobada no se pierde por una edición.
+    Devuelve DELETED o CHANGES_REVERTED.
+    """
+    from notifications.signals import create_product_rejected_notification
+
+    if product.status != 'pending' and product.pending_review_changes is not None:
+        return reject_changes(product, reason, image_hashes)
+
+    product_id = product.id
+    product_title = product.title
+    product_seller = product.seller
+    product_category_name = product.category.name if product.category else 'Varios'
+
+    record = record_moderation_outcome(product, False, reason, image_hashes)
+    notify_review_completed(product, 'rejected', record)
+
+    # Guardar imágenes para eliminarlas
+    image_paths = [img.image.path for img in product.images.all()]
+
+    # Eliminar producto (lo que también eliminará las imágenes por CASCADE)
+    product.delete()
+
+    # Crear notificación al vendedor sobre el rechazo
+    create_product_rejected_notification(product_seller, product_title, reason, product_category_name)
+
+    # Intentar eliminar archivos físicos
+    for path in image_paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.error(f"Error eliminando imagen {path}: {str(e)}")
+
+    logger.warning(f"Producto #{product_id} rechazado y eliminado: {reason}")
+    return DELETED
+
+
+def reject_changes(product, reason, image_hashes=None):
+    """
+    Rechazo de una re-revisión: se eliminan las imágenes agregadas desde la última
+    aprobación y el producto sigue publicado con las ya aprobadas. Los cambios de texto
+    no se re-revisan por sí solos (ver products.views.ProductViewSet.update).
+    """
+    from notifications.models import Notification
+
+    changes = product.pending_review_changes or {}
+    record = record_moderation_outcome(product, False, reason, image_hashes)
+
+    rejected_images = list(ProductImage.objects.filter(product=product, pk__in=changes.get('images', [])))
+    rejected_ids = [image.pk for image in rejected_images]
+    for image in rejected_images:
+        image.delete()
+        try:
+            image.image.storage.delete(image.image.name)
+        except Exception as e:
+            logger.error(f"Error eliminando imagen {image.image.name}: {str(e)}")
+    if rejected_images and not product.images.filter(is_primary=True).exists():
+        first = product.images.order_by('id').first()
+        if first:
+            first.is_primary = True
+            first.save(update_fields=['is_primary'])
+
+    close_review(product, changes or None)
+    notify_review_completed(product, product.status, record, approved=False)
+    Notification.objects.create(
+        user_id=product.seller_id,
+        type='product_rejected',
+        title='Cambios rechazados',
+        message=(
+            f"Las imágenes nuevas de tu producto {product.title} fueron rechazadas por incumplir las "
+            f"políticas de venta de UOH Market. La publicación sigue activa con sus imágenes anteriores."
+        ),
+        related_product_id=product.id,
+        extra_data={'rejection_reason': reason, 'rejected_images': rejected_ids},
+    )
+    logger.warning(
+        f"Cambios del producto #{product.id} rechazados ({len(rejected_images)} imágenes eliminadas): {reason}"
+    )
+    return CHANGES_REVERTED
+
+
+def close_review(product, reviewed_changes):
+    """
+    Saca el producto de la cola, salvo que el vendedor lo haya editado durante la revisión:
+    en ese caso los cambios nuevos (sin las imágenes ya revisadas) quedan pendientes con la
+    fecha que les dio schedule_rereview. Se lee la fila bloqueada en lugar de confiar en la
+    copia cargada al reservar el producto.
+    """
+    with transaction.atomic():
+        current = (
+            Product.objects.select_for_update().filter(pk=product.pk)
+            .values_list('pending_review_changes', 'review_scheduled_at').first()
+        )
+        if current is None:
+            return
+        changes, scheduled_at = current
+        if changes == reviewed_changes:
+            changes, scheduled_at = None, None
+        else:
+            reviewed_images = set((reviewed_changes or {}).get('images', []))
+            changes = {**changes, 'images': [i for i in changes.get('images', []) if i not in reviewed_images]}
+            scheduled_at = scheduled_at or timezone.now()
+            logger.info(f"Producto #{product.id} editado durante la revisión: cambios nuevos pendientes {changes}")
+        Product.objects.filter(pk=product.pk).update(pending_review_changes=changes, review_scheduled_at=scheduled_at)
+    product.pending_review_changes = changes
+    product.review_scheduled_at = scheduled_at
+    # update() no dispara signals: las imágenes aprobadas o eliminadas cambian lo que muestra el catálogo
+    bump_version(CATALOG)
+
+
+def approve_product(product, reason, image_hashes=None):
+    record = record_moderation_outcome(product, True, reason, image_hashes)
+    reviewed_changes = product.pending_review_changes
+    if product.status == 'pending':
+        # Respetar la marca manual de "No disponible" puesta mientras estaba en revisión
+        product.status = 'unavailable' if product.manually_unavailable else 'available'
+        product.save(update_fields=['status'])
+    close_review(product, reviewed_changes)
+    notify_review_completed(product, product.status, record)
+    logger.info(f"Producto #{product.id} aprobado ({product.status})")
+
+
+def schedule_rereview(product, changed_fields: Iterable[str] = (), image_ids: Iterable[int] = ()):
+    """
+    Agrupa las ediciones de un producto en una sola re-revisión pendiente.
+
+    El producto conserva su estado (un producto publicado sigue visible mientras
+    tanto); solo entra a la cola de revisión. Cada edición dentro de la ventana de silencio une sus campos e imágenes
+    con el trabajo existente y posterga la revisión, hasta un máximo de
+    PRODUCT_REREVIEW_MAX_WAIT segundos desde la primera edición.
+    """
+    from .risk import plan_product_review
+
+    now = timezone.now()
+    quiet_window = getattr(settings, 'PRODUCT_REREVIEW_QUIET_WINDOW', 30)
+    max_wait = getattr(settings, 'PRODUCT_REREVIEW_MAX_WAIT', 300)
+
+    changes = product.pending_review_changes or {}
+    since = parse_datetime(changes['since']) if changes.get('since') else now
+    fields = sorted(set(changes.get('fields', [])) | set(changed_fields))
+    images = sorted(set(changes.get('images', [])) | {int(i) for i in image_ids})
+
+    plan = plan_product_review(product)
+    # Si solo cambió el texto, las imágenes ya fueron aprobadas y basta la vía rápida
+    depth = plan.depth if images else 'fast'
+
+    product.pending_review_changes = {'fields': fields, 'images': images, 'since': since.isoformat()}
+    product.review_scheduled_at = min(
+        now + datetime.timedelta(seconds=quiet_window),
+        since + datetime.timedelta(seconds=max_wait),
+    )
+    product.review_priority = plan.priority
+    product.review_depth = depth
+    product.risk_score = plan.risk_score
+    product.save(update_fields=[
+        'pending_review_changes', 'review_scheduled_at',
+        'review_priority', 'review_depth', 'risk_score',
+    ])
+    logger.info(
+        f"Re-revisión del producto #{product.id} programada para "
+        f"{product.review_scheduled_at.strftime('%Y-%m-%d %H:%M:%S')} (campos={fields}, imágenes={images})"
+    )
+    return product.pending_review_changes
+
+
+def review_product(product) -> Tuple[str, str]:
+    """
+    Ejecuta la moderación de un producto pendiente y aplica el resultado.
+    La profundidad del análisis la decide el plan de riesgo guardado en el producto.
+    Devuelve (APPROVED, DELETED o CHANGES_REVERTED, motivo).
+    """
+    from .intelligent_moderator import moderate_product_with_ai
+    from .utils import validate_image_filenames
+
+    images = list(product.images.all())
+    if not any(os.path.exists(img.image.path) for img in images):
+        reason = 'El producto no tiene imágenes válidas para analizar.'
+        return reject_product(product, reason), reason
+
+    # Se calculan una sola vez: sirven para la vía rápida y para el historial de moderación
+    hashes_by_image = {img.id: compute_image_hash(img) for img in images}
+    image_hashes = [h for h in hashes_by_image.values() if h]
+
+    # Primero validar nombres de archivos (un nombre inapropiado no dice nada del contenido:
+    # las imágenes no quedan registradas como rechazadas)
+    image_filenames = [os.path.basename(img.image.name) for img in images]
+    filename_validation = validate_image_filenames(image_filenames)
+    if not filename_validation['approved']:
+        reason = filename_validation['reason']
+        return reject_product(product, reason), reason
+
+    # Si los nombres de archivos son apropiados, proceder con el análisis según el plan.
+    # En una re-revisión solo se analizan con IA las imágenes nuevas; un producto que nunca
+    # fue aprobado se analiza completo aunque se haya editado mientras esperaba
+    changed_images = None
+    if product.status != 'pending':
+        changed_images = (product.pending_review_changes or {}).get('images') or None
+    result = moderate_product_with_ai(product, product.review_depth, changed_images, image_hashes)
+    if result.approved:
+        approve_product(product, result.reason, image_hashes)
+        return APPROVED, result.reason
+    # Rechazos por texto o precio no marcan las fotos: otra publicación puede reutilizarlas
+    flagged_hashes = [hashes_by_image[i] for i in result.flagged_images if hashes_by_image.get(i)]
+    return reject_product(product, result.reason, flagged_hashes), result.reason
@@ -0,0 +1,133 @@
+"""
+Búsqueda de texto completo de productos.
+
+- PostgreSQL: columna generada ``search_vector`` (configuración 'spanish', título con
+  peso A y descripción con peso B) con índice GIN, ranking con ts_rank y similitud de
+  trigramas sobre el título para tolerar errores de tipeo.
+- SQLite (desarrollo): tabla virtual FTS5 ``products_product_fts`` sincronizada por
+  signals (ver products/signals.py), ranking con bm25.
+- Cualquier otro motor usa el SearchFilter de DRF (icontains).
+
+Las estructuras se crean en la migración 0008_product_search_index.
+"""
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+FTS_TABLE = 'products_product_fts'
+
+# Nombre de la base de datos -> existe la tabla FTS5. Se guarda por base (las pruebas usan
+# otra) y se vacía después de cada migrate, que es lo único que crea o borra la tabla
+_fts_available = {}
+
+
+def sqlite_fts_available():
+    """Indica si existe la tabla FTS5 (se consulta una sola vez por base de datos)"""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_available:
+        _fts_available[name] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[name]
+
+
+def reset_fts_available():
+    _fts_available.clear()
+
+
+def build_fts5_query(terms):
+    """Convierte los términos en una consulta FTS5 segura: cada término entre comillas y con prefijo"""
+    cleaned = [term.replace('"', '') for term in terms]
+    return ' '.join(f'"{term}"*' for term in cleaned if term)
+
+
+def search_postgres(queryset, query):
+    match = RawSQL(
+        '"products_product"."search_vector" @@ websearch_to_tsquery(\'spanish\', %s)',
+        [query], output_field=BooleanField()
+    )
+    # El operador % usa pg_trgm.similarity_threshold (0.3 por defecto) y el índice de trigramas
+    similar = RawSQL('"products_product"."title" %% %s', [query], output_field=BooleanField())
+    rank = RawSQL(
+        'ts_rank("products_product"."search_vector", websearch_to_tsquery(\'spanish\', %s))'
+        ' + 0.5 * similarity("products_product"."title", %s)',
+        [query, query], output_field=FloatField()
+    )
+    return queryset.filter(Q(match) | Q(similar)).annotate(search_rank=rank)
+
+
+def search_sqlite(queryset, terms):
+    fts_query = build_fts5_query(terms)
+    if not fts_query:
+        return queryset
+    # El filtro es una subconsulta no correlacionada (el MATCH se evalúa una vez); el ranking
+    # busca por rowid dentro del mismo MATCH, que FTS5 resuelve sin recorrer toda la lista.
+    # bm25 devuelve valores negativos (más negativo = más relevante); el título pesa el doble.
+    matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query])
+    rank = RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "products_product"."id"',
+        [fts_query], output_field=FloatField()
+    )
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Reemplaza las consultas icontains de SearchFilter por el índice de texto completo,
+    manteniendo el mismo parámetro ?search=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        if connection.vendor == 'postgresql':
+            return search_postgres(queryset, ' '.join(terms))
+        if sqlite_fts_available():
+            return search_sqlite(queryset, terms)
+        return super().filter_queryset(request, queryset, view)
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """Si hay búsqueda y no se pidió un orden explícito, ordenar por relevancia"""
+
+    def filter_queryset(self, request, queryset, view):
+        ranked = 'search_rank' in queryset.query.annotations
+        if ranked and not request.query_params.get(self.ordering_param):
+            return queryset.order_by('-search_rank', '-created_at')
+        return super().filter_queryset(request, queryset, view)
+
+
+def sync_product_search_index(product):
+    """Actualiza la fila FTS5 de un producto (solo SQLite; en PostgreSQL la columna es generada)"""
+    if not sqlite_fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [product.pk, product.title, product.description]
+        )
+
+
+def remove_product_search_index(product_id):
+    if not sqlite_fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_search_index():
+    """Reconstruye la tabla FTS5 completa (por ejemplo, después de bulk_create)"""
+    if not sqlite_fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+            f'SELECT id, title, description FROM products_product'
+        )
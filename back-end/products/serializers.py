@@ -10,38 +10,58 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'description']
 
+class CategoryListSerializer(CategorySerializer):
+    """Categoría con la cantidad de productos disponibles (anotada desde CategoryProductCount)"""
+    available_products = serializers.IntegerField(read_only=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['available_products']
+
 class ProductBasicSerializer(serializers.ModelSerializer):
     """Serializador simplificado para productos, usado en notificaciones"""
     class Meta:
         model = Product
         fields = ['id', 'title', 'price']
 
+def absolute_media_url(url, request=None):
+    """URL absoluta de un archivo del storage (las de S3/GCS ya lo son)"""
+    if url.startswith('http://') or url.startswith('https://'):
+        return url
+    if request:
+        return request.build_absolute_uri(url)
+    from django.conf import settings
+    base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
+    if 'railway.app' in base_url and base_url.startswith('http://'):
+        base_url = base_url.replace('http://', 'https://')
+    return f"{base_url}{url}"
+
+def rendition_urls(image, request=None):
+    """Versiones reducidas como {'webp': {'160': url, ...}, 'jpeg': {...}}, para armar srcset; {} si aún no existen"""
+    renditions = image.renditions or {}
+    storage = image.image.storage
+    return {
+        name: {width: absolute_media_url(storage.url(path), request) for width, path in paths.items()}
+        for name, paths in renditions.items()
+    }
+
 class ProductImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'is_primary']
+        fields = ['id', 'image', 'is_primary', 'srcset']
     
     def get_image(self, obj):
         if obj.image:
-            url = obj.image.url
-            # Si la URL ya es absoluta (S3), devuélvela tal cual
-            if url.startswith('http://') or url.startswith('https://'):
-                return url
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(url)
-            else:
-                from django.conf import settings
-                base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-                if 'railway.app' in base_url and base_url.startswith('http://'):
-                    base_url = base_url.replace('http://', 'https://')
-                return f"{base_url}{url}"
+            return absolute_media_url(obj.image.url, self.context.get('request'))
         return None
 
+    def get_srcset(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
 class ProductSerializer(serializers.ModelSerializer):
-    images = ProductImageSerializer(many=True, read_only=True)
+    images = serializers.SerializerMethodField()
     category_name = serializers.ReadOnlyField(source='category.name')
     seller_username = serializers.ReadOnlyField(source='seller.username')
     is_favorite = serializers.SerializerMethodField()
@@ -54,10 +74,11 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'price', 'original_price', 'category', 'category_name',
             'seller', 'seller_username', 'condition', 'created_at', 'updated_at',
             'is_available', 'views_count', 'images', 'is_favorite', 'status',
-            'review_scheduled_at', 'manually_unavailable', 'main_image_url'        ]
+            'review_scheduled_at', 'manually_unavailable', 'main_image_url',
+            'discount_pct', 'discounted_at'        ]
         read_only_fields = [
             'views_count', 'created_at', 'updated_at', 
-            'review_scheduled_at', 'manually_unavailable'
+            'review_scheduled_at', 'manually_unavailable', 'discount_pct', 'discounted_at'
         ]
     
     def get_seller(self, obj):
@@ -80,15 +101,9 @@ class ProductSerializer(serializers.ModelSerializer):
                         base_url = base_url.replace('http://', 'https://')
                     profile_picture = f"{base_url}{seller.profile.profile_picture.url}"
             
-            # Calcular calificaciones promedio para el vendedor
-            from accounts.models import Rating
-            from django.db import models
-            ratings = Rating.objects.filter(rated_user=seller)
-            average_rating = 0
-            total_ratings = ratings.count()
-            
-            if total_ratings > 0:
-                average_rating = ratings.aggregate(avg_rating=models.Avg('rating'))['avg_rating'] or 0
+            # Reputación precalculada en el perfil (ver accounts.models.Profile.apply_rating_delta)
+            total_ratings = seller.profile.rating_count
+            average_rating = seller.profile.rating_avg
             
             profile_data = {
                 'average_rating': round(average_rating, 2),
@@ -108,6 +123,9 @@ class ProductSerializer(serializers.ModelSerializer):
     def get_is_favorite(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            # Anotado con Exists() por ProductViewSet.get_queryset
+            if hasattr(obj, 'favorited_by_user'):
+                return obj.favorited_by_user
             return Favorite.objects.filter(user=request.user, product=obj).exists()
         return False
     
@@ -117,22 +135,121 @@ class ProductSerializer(serializers.ModelSerializer):
         product = Product.objects.create(seller=user, **validated_data)
         return product
 
+    def get_visible_images(self, obj):
+        """
+        Imágenes que se pueden mostrar. Las agregadas a un producto publicado esperan la
+        re-revisión en pending_review_changes y hasta su aprobación solo las ve el vendedor.
+        """
+        # Usar la lista de imágenes (precargada en los listados) en lugar de consultas nuevas
+        images = list(obj.images.all())
+        pending = set((obj.pending_review_changes or {}).get('images', ()))
+        if pending:
+            request = self.context.get('request')
+            user = getattr(request, 'user', None)
+            if not (user and user.is_authenticated and user.id == obj.seller_id):
+                images = [img for img in images if img.id not in pending]
+        return images
+
+    def get_primary_image(self, images):
+        return next((img for img in images if img.is_primary), None) or (images[0] if images else None)
+
+    def get_images(self, obj):
+        return ProductImageSerializer(self.get_visible_images(obj), many=True, context=self.context).data
+
     def get_main_image_url(self, obj):
-        request = self.context.get('request')
-        primary = obj.images.filter(is_primary=True).first() or obj.images.first()
+        primary = self.get_primary_image(self.get_visible_images(obj))
         if primary and primary.image:
-            url = primary.image.url
-            if url.startswith('http://') or url.startswith('https://'):
-                return url
-            if request:
-                return request.build_absolute_uri(url)
-            from django.conf import settings
-            base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-            if 'railway.app' in base_url and base_url.startswith('http://'):
-                base_url = base_url.replace('http://', 'https://')
-            return f"{base_url}{url}"
+            return absolute_media_url(primary.image.url, self.context.get('request'))
         return None
 
+class SparseFieldsetMixin:
+    """
+    Permite recortar la representación con ?fields=a,b y pedir campos completos con ?expand=x,y.
+    La vista pasa los conjuntos en el contexto ('fields' y 'expand'); fields solo se aplica
+    al serializer raíz, no a los anidados.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested and self.is_root_item():
+            for name in set(fields) - set(requested):
+                fields.pop(name)
+        return fields
+
+    def is_root_item(self):
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+    def is_expanded(self, name):
+        return name in self.context.get('expand', ())
+
+
+class ProductCardSerializer(SparseFieldsetMixin, ProductSerializer):
+    """
+    Representación reducida para las tarjetas de los listados: extracto de la descripción,
+    solo la imagen principal y el vendedor con id y nombre de usuario.
+
+    Expandibles con ?expand=: description (completa), images (todas) y seller (con perfil).
+    """
+    DESCRIPTION_EXCERPT_LENGTH = 160
+    # Campos del modelo que necesita cada campo de la tarjeta (ver ProductViewSet.get_queryset)
+    FIELD_SOURCES = {
+        'id': ['id'],
+        'title': ['title'],
+        'description': [],
+        'price': ['price'],
+        'original_price': ['original_price'],
+        'discount_pct': ['discount_pct'],
+        'category': ['category'],
+        'category_name': ['category__name'],
+        'seller': ['seller__id', 'seller__username'],
+        'seller_username': ['seller__username'],
+        'condition': ['condition'],
+        'status': ['status'],
+        'created_at': ['created_at'],
+        'views_count': ['views_count'],
+        # Las imágenes en re-revisión se ocultan a quien no es el vendedor
+        'images': ['seller', 'pending_review_changes'],
+        'main_image_url': ['seller', 'pending_review_changes'],
+        'is_favorite': [],
+    }
+
+    description = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
+
+    class Meta(ProductSerializer.Meta):
+        fields = [
+            'id', 'title', 'description', 'price', 'original_price', 'discount_pct', 'category', 'category_name',
+            'seller', 'seller_username', 'condition', 'status', 'created_at', 'views_count',
+            'images', 'main_image_url', 'is_favorite',
+        ]
+
+    def get_description(self, obj):
+        if self.is_expanded('description'):
+            return obj.description
+        # Extracto calculado en SQL por ProductViewSet cuando está disponible
+        text = getattr(obj, 'description_excerpt', None)
+        if text is None:
+            text = obj.description
+        if len(text) > self.DESCRIPTION_EXCERPT_LENGTH:
+            return text[:self.DESCRIPTION_EXCERPT_LENGTH].rstrip() + '…'
+        return text
+
+    def get_images(self, obj):
+        images = self.get_visible_images(obj)
+        if not self.is_expanded('images'):
+            primary = self.get_primary_image(images)
+            images = [primary] if primary else []
+        return ProductImageSerializer(images, many=True, context=self.context).data
+
+    def get_seller(self, obj):
+        if self.is_expanded('seller'):
+            return super().get_seller(obj)
+        return {'id': obj.seller.id, 'username': obj.seller.username}
+
 class ProductDetailSerializer(ProductSerializer):
     # Heredamos el campo seller como SerializerMethodField del ProductSerializer
     # No lo sobrescribimos para mantener la funcionalidad de la foto de perfil
@@ -144,7 +261,7 @@ class ProductDetailSerializer(ProductSerializer):
 
 class FavoriteSerializer(serializers.ModelSerializer):
     # Si quieres incluir detalles del producto en respuestas GET
-    product_detail = ProductSerializer(source='product', read_only=True)
+    product_detail = ProductCardSerializer(source='product', read_only=True)
     
     class Meta:
         model = Favorite
@@ -182,4 +299,24 @@ class FavoriteSerializer(serializers.ModelSerializer):
         )
         
         logger.info(f"Favorito creado: {favorite.id}")
-        return favorite
\ No newline at end of file
+        return favorite
+
+class ProductBulkActionSerializer(serializers.Serializer):
+    """Cuerpo de POST /api/products/bulk/ (ver products/bulk.py)"""
+    ACTION_CHOICES = ['mark_unavailable', 'mark_available', 'delete', 'reprice']
+    MAX_IDS = 500
+
+    action = serializers.ChoiceField(choices=ACTION_CHOICES)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_IDS
+    )
+    # reprice: precio nuevo para todos o porcentaje de cambio (-20 = 20% más barato)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=1, required=False)
+    percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=-99, max_value=1000, required=False)
+
+    def validate(self, attrs):
+        attrs['ids'] = list(dict.fromkeys(attrs['ids']))
+        if attrs['action'] == 'reprice':
+            if ('price' in attrs) == ('percent' in attrs):
+                raise serializers.ValidationError('Para cambiar precios indique "price" o "percent" (solo uno).')
+        return attrs
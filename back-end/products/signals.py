@@ -0,0 +1,203 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Rating
+from chat.models import Conversation
+
+from .cache import CATALOG, CATEGORIES, FAVORITES, WEEKLY_OFFERS, bump_version
+from .models import Category, CategoryProductCount, Favorite, Product, ProductImage
+from .popularity import record_event
+from .renditions import delete_renditions, schedule_renditions
+from .search import remove_product_search_index, reset_fts_available, sync_product_search_index
+from .similar import similarity_index
+from .suggest import suggestion_index
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, created, update_fields=None, **kwargs):
+    """Mantiene la tabla FTS5 sincronizada con el título y la descripción"""
+    if update_fields and not {'title', 'description'} & set(update_fields):
+        return
+    sync_product_search_index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_search_index(sender, instance, **kwargs):
+    remove_product_search_index(instance.pk)
+
+
+@receiver(post_migrate)
+def reset_search_index_state(sender, **kwargs):
+    """migrate puede crear o borrar la tabla FTS5: la próxima consulta vuelve a revisar si existe"""
+    reset_fts_available()
+
+
+# Los índices en memoria (sugerencias y similares) se actualizan al confirmar la
+# transacción: si se revierte, no quedan con productos que no existen en la base de datos
+
+@receiver(post_save, sender=Product)
+def update_product_suggestions(sender, instance, update_fields=None, **kwargs):
+    """Actualiza el índice de sugerencias (título, estado, categoría y peso por visitas)"""
+    transaction.on_commit(lambda: suggestion_index.update_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_suggestions(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: suggestion_index.remove_product(product_id))
+
+
+# Campos que forman el vector de productos similares
+SIMILARITY_FIELDS = {'title', 'description', 'category', 'category_id'}
+
+
+@receiver(post_save, sender=Product)
+def update_product_similarity(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SIMILARITY_FIELDS & set(update_fields):
+        if 'status' in update_fields:
+            product_id, status = instance.pk, instance.status
+            transaction.on_commit(lambda: similarity_index.update_status(product_id, status))
+        return
+    transaction.on_commit(lambda: similarity_index.update_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_similarity(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: similarity_index.remove_product(product_id))
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggestions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: suggestion_index.update_category(instance))
+
+
+@receiver(post_delete, sender=Category)
+def delete_category_suggestions(sender, instance, **kwargs):
+    category_id = instance.pk
+    transaction.on_commit(lambda: suggestion_index.remove_category(category_id))
+
+
+# Campos que determinan qué productos aparecen en las ofertas semanales y cómo se muestran
+WEEKLY_OFFERS_FIELDS = ('price', 'original_price', 'status', 'title')
+
+
+@receiver(post_save, sender=Product)
+def invalidate_weekly_offers(sender, instance, created, update_fields=None, **kwargs):
+    fields = WEEKLY_OFFERS_FIELDS
+    if update_fields:
+        fields = [field for field in fields if field in update_fields]
+    if created:
+        changed = instance.status == 'available'
+    else:
+        changed = bool(instance.changed_fields(fields))
+    if changed:
+        bump_version(WEEKLY_OFFERS)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_weekly_offers_on_delete(sender, instance, **kwargs):
+    bump_version(WEEKLY_OFFERS)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def invalidate_catalog_on_save(sender, instance, update_fields=None, **kwargs):
+    """Invalida todas las respuestas cacheadas del catálogo incrementando su versión"""
+    if update_fields and set(update_fields) <= {'views_count'}:
+        # Las visitas no justifican invalidar todo el catálogo
+        return
+    bump_version(CATALOG)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_on_delete(sender, instance, **kwargs):
+    bump_version(CATALOG)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_catalog_on_rating(sender, instance, **kwargs):
+    """Las calificaciones cambian la reputación del vendedor que se muestra en cada producto"""
+    bump_version(CATALOG)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_user_favorites(sender, instance, **kwargs):
+    """Cambia los validadores (ETag) de las respuestas del usuario, que incluyen is_favorite"""
+    bump_version(f'{FAVORITES}:{instance.user_id}')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Conversation)
+def add_product_popularity(sender, instance, created, **kwargs):
+    """Los favoritos y conversaciones nuevos suman a la popularidad (UPDATE con F(), sin signals)"""
+    if created:
+        record_event(instance.product_id, 'favorite' if sender is Favorite else 'conversation')
+
+
+# Campos que determinan en qué contador de productos disponibles está un producto
+AVAILABILITY_FIELDS = ('category_id', 'status')
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_availability(sender, instance, update_fields=None, **kwargs):
+    """Categoría y disponibilidad antes de guardar, para mover solo la diferencia en los contadores"""
+    instance._previous_availability = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {'status', 'category', 'category_id'} & set(update_fields):
+        instance._previous_availability = (instance.category_id, instance.status == 'available')
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if all(field in loaded for field in AVAILABILITY_FIELDS):
+        category_id, status = loaded['category_id'], loaded['status']
+    else:
+        category_id, status = Product.objects.filter(pk=instance.pk).values_list(*AVAILABILITY_FIELDS).first() or (None, None)
+    instance._previous_availability = (category_id, status == 'available')
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts(sender, instance, created, **kwargs):
+    deltas = Counter()
+    previous = getattr(instance, '_previous_availability', None)
+    if previous and previous[1]:
+        deltas[previous[0]] -= 1
+    if instance.status == 'available':
+        deltas[instance.category_id] += 1
+    if CategoryProductCount.apply_deltas(deltas):
+        bump_version(CATEGORIES)
+
+
+@receiver(post_delete, sender=Product)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    if instance.status == 'available' and CategoryProductCount.apply_deltas({instance.category_id: -1}):
+        bump_version(CATEGORIES)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_list(sender, instance, **kwargs):
+    bump_version(CATEGORIES)
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_image_renditions(sender, instance, created, **kwargs):
+    """Versiones reducidas de cada imagen nueva, en segundo plano después del commit"""
+    if created:
+        schedule_renditions([instance.pk])
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_image_renditions(sender, instance, **kwargs):
+    """Las versiones reducidas se borran con la imagen, una vez confirmado el borrado"""
+    if instance.renditions:
+        renditions, storage = instance.renditions, instance.image.storage
+        transaction.on_commit(lambda: delete_renditions(renditions, storage))
@@ -0,0 +1,300 @@
+"""
+Productos similares (/api/products/{id}/similar/).
+
+Índice TF-IDF en memoria sobre título, descripción y categoría, con las palabras y
+pares de palabras llevados a un espacio fijo de columnas por hashing (no hay
+vocabulario que mantener). Cada producto conserva sus MAX_FEATURES columnas de mayor
+peso; los vectores se guardan normalizados en matrices dispersas float32
+(scipy.sparse): una por producto y su transpuesta como índice invertido, de modo que
+la similitud coseno solo recorre los productos que comparten alguna columna.
+
+Como el índice de sugerencias (products/suggest.py), se construye en la primera
+consulta, se actualiza con los signals de Product y se reconstruye completo, en un
+hilo aparte, cada PRODUCT_SIMILAR_REBUILD_SECONDS para recalcular los IDF e
+incorporar cambios de otros procesos.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from scipy import sparse
+
+from .suggest import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 20
+MAX_FEATURES = 64
+TITLE_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.5
+MIN_WORD_LENGTH = 2
+# Filas agregadas por los signals que se acumulan antes de pasarlas a la matriz principal
+MAX_EXTRA_ROWS = 1000
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+@lru_cache(maxsize=200000)
+def _feature(token):
+    # crc32 es estable entre procesos (hash() de Python no lo es)
+    return zlib.crc32(token.encode('utf-8')) % N_FEATURES
+
+
+def _words(text):
+    # Sin tildes ni mayúsculas, igual que las sugerencias, pero vía ASCII (más rápido en textos largos)
+    plain = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return [word for word in WORD_RE.findall(plain) if len(word) >= MIN_WORD_LENGTH and word not in STOPWORDS]
+
+
+def term_frequencies(title, description, category_id):
+    """Frecuencias ponderadas por columna: palabras y pares de palabras del título y la descripción, y la categoría"""
+    counts = Counter()
+    for text, weight in ((title, TITLE_WEIGHT), (description, 1.0)):
+        words = _words(text)
+        for word in words:
+            counts[_feature(word)] += weight
+        for first, second in zip(words, words[1:]):
+            counts[_feature(f'{first} {second}')] += weight
+    if category_id is not None:
+        counts[_feature(f'cat:{category_id}')] += CATEGORY_WEIGHT
+    return counts
+
+
+def tfidf_matrix(frequencies, idf):
+    """
+    Matriz CSR de vectores TF-IDF (tf sublineal), recortados a MAX_FEATURES columnas
+    por fila y normalizados a largo 1. Los pesos se calculan sobre arreglos planos.
+    """
+    lengths = np.fromiter((len(counts) for counts in frequencies), dtype=np.int64, count=len(frequencies))
+    total = int(lengths.sum())
+    columns = np.fromiter((c for counts in frequencies for c in counts), dtype=np.int32, count=total)
+    counts = np.fromiter((v for counts in frequencies for v in counts.values()), dtype=np.float32, count=total)
+    weights = (1 + np.log(counts)) * idf[columns]
+
+    indptr = np.zeros(len(frequencies) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    long_rows = np.flatnonzero(lengths > MAX_FEATURES)
+    if len(long_rows):
+        keep = np.ones(total, dtype=bool)
+        for row in long_rows:
+            start, end = indptr[row], indptr[row + 1]
+            drop = np.argpartition(weights[start:end], end - start - MAX_FEATURES)[:end - start - MAX_FEATURES]
+            keep[start + drop] = False
+        rows = np.repeat(np.arange(len(frequencies)), lengths)[keep]
+        columns, weights = columns[keep], weights[keep]
+        lengths = np.bincount(rows, minlength=len(frequencies))
+        np.cumsum(lengths, out=indptr[1:])
+
+    rows = np.repeat(np.arange(len(frequencies)), lengths)
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(frequencies)))
+    norms[norms == 0] = 1
+    weights = (weights / norms[rows]).astype(np.float32)
+    matrix = sparse.csr_matrix((weights, columns, indptr), shape=(len(frequencies), N_FEATURES))
+    matrix.sort_indices()
+    return matrix
+
+
+class SimilarityData:
+    """Contenido del índice: matrices, ids y disponibilidad. Se reemplaza completo en cada reconstrucción"""
+
+    def __init__(self):
+        empty = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self.matrix = empty                 # filas de la última reconstrucción (o del último traspaso)
+        self.inverted = empty.T.tocsr()     # columna -> productos (transpuesta de matrix)
+        self.extra = empty                  # filas agregadas desde entonces por los signals
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.available = np.zeros(0, dtype=bool)
+        self.rows = {}  # id de producto -> fila vigente (las de extra van después de las de matrix)
+        # IDF por columna; las columnas sin documentos al construir reciben el máximo
+        self.idf = np.ones(N_FEATURES, dtype=np.float32)
+
+    @classmethod
+    def load(cls):
+        from .models import Product
+
+        data = cls()
+        ids, available, frequencies = [], [], []
+        products = Product.objects.values_list('id', 'title', 'description', 'category_id', 'status')
+        for product_id, title, description, category_id, status in products.iterator(chunk_size=2000):
+            ids.append(product_id)
+            available.append(status == 'available')
+            frequencies.append(term_frequencies(title, description, category_id))
+
+        # IDF suavizado sobre la frecuencia de documentos de cada columna
+        document_frequency = np.bincount(
+            np.fromiter((c for counts in frequencies for c in counts), dtype=np.int64),
+            minlength=N_FEATURES,
+        )
+        data.idf = (np.log((1 + len(ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        data.matrix = tfidf_matrix(frequencies, data.idf)
+        data.inverted = data.matrix.T.tocsr()
+        data.ids = np.asarray(ids, dtype=np.int64)
+        data.available = np.asarray(available, dtype=bool)
+        data.rows = {product_id: row for row, product_id in enumerate(ids)}
+        return data
+
+    def update_product(self, product_id, title, description, category_id, status):
+        """La fila anterior queda desactivada y se agrega una nueva con el texto actual"""
+        self.discard(product_id)
+        vector = tfidf_matrix([term_frequencies(title, description, category_id)], self.idf)
+        self.extra = sparse.vstack([self.extra, vector], format='csr')
+        self.rows[product_id] = len(self.ids)
+        self.ids = np.append(self.ids, product_id)
+        self.available = np.append(self.available, status == 'available')
+        if self.extra.shape[0] >= MAX_EXTRA_ROWS:
+            self.fold_extra()
+
+    def fold_extra(self):
+        """
+        Pasa las filas agregadas a la matriz principal y rehace el índice invertido: extra
+        se recorre completa en cada consulta, así que no puede crecer sin límite entre
+        reconstrucciones. Las filas desactivadas se descartan recién al reconstruir.
+        """
+        self.matrix = sparse.vstack([self.matrix, self.extra], format='csr')
+        self.inverted = self.matrix.T.tocsr()
+        self.extra = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+
+    def update_status(self, product_id, status):
+        """Cambio de disponibilidad sin cambio de texto: solo se actualiza la máscara"""
+        row = self.rows.get(product_id)
+        if row is not None:
+            self.available[row] = status == 'available'
+
+    def discard(self, product_id):
+        row = self.rows.pop(product_id, None)
+        if row is not None:
+            # La fila queda en las matrices hasta la próxima reconstrucción, sin poder aparecer en resultados
+            self.available[row] = False
+
+    def similar(self, product_id, limit):
+        row = self.rows.get(product_id)
+        if row is None:
+            return []
+        built = self.matrix.shape[0]
+        vector = self.matrix[row] if row < built else self.extra[row - built]
+
+        # Solo las filas del índice invertido de las columnas del producto: sum(peso_q * peso_fila)
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        scores[:built] = self.inverted[vector.indices].T @ vector.data
+        if self.extra.shape[0]:
+            scores[built:] = (self.extra @ vector.T).toarray().ravel()
+        scores[~self.available] = 0
+        scores[row] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [int(product_id) for product_id in self.ids[candidates]]
+
+
+class SimilarityIndex:
+    """
+    Índice compartido por las peticiones del proceso, con el mismo esquema que
+    products.suggest.SuggestionIndex: las reconstrucciones leen la base de datos y
+    calculan las matrices sin tomar el lock, los cambios recibidos mientras tanto se
+    repiten sobre el contenido nuevo y luego se cambia de una vez.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # una reconstrucción a la vez
+        self._built_at = None
+        self._rebuilding = False
+        self._replay = None  # [(método, argumentos)] recibidos durante una reconstrucción
+        self.data = SimilarityData()
+
+    @property
+    def rebuild_interval(self):
+        return getattr(settings, 'PRODUCT_SIMILAR_REBUILD_SECONDS', 1800)
+
+    def is_built(self):
+        return self._built_at is not None
+
+    def ensure_built(self):
+        if self._built_at is None:
+            # Primera consulta del proceso: no hay nada que responder hasta construirlo
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif time.monotonic() - self._built_at > self.rebuild_interval:
+            self.rebuild_in_background()
+
+    def rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._background_rebuild, name='similar-rebuild', daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error(f"Error reconstruyendo el índice de productos similares: {str(e)}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+            connection.close()
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Se llama con self._build_lock tomado; la base de datos se lee sin bloquear las consultas
+        with self._lock:
+            self._replay = []
+        try:
+            data = SimilarityData.load()
+            with self._lock:
+                for method, args in self._replay:
+                    getattr(data, method)(*args)
+                self.data = data
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._replay = None
+
+    # --- Actualización incremental (desde signals) ---
+
+    def _apply(self, method, *args):
+        """Aplica un cambio al contenido actual y, si hay una reconstrucción en curso, lo guarda para el nuevo"""
+        with self._lock:
+            if not self.is_built() and self._replay is None:
+                return
+            getattr(self.data, method)(*args)
+            if self._replay is not None:
+                self._replay.append((method, args))
+
+    def update_product(self, product):
+        self._apply(
+            'update_product', product.pk, product.title, product.description, product.category_id, product.status,
+        )
+
+    def update_status(self, product_id, status):
+        self._apply('update_status', product_id, status)
+
+    def remove_product(self, product_id):
+        self._apply('discard', product_id)
+
+    # --- Consulta ---
+
+    def similar(self, product_id, limit=8):
+        """Ids de los productos disponibles más parecidos, de mayor a menor similitud"""
+        self.ensure_built()
+        with self._lock:
+            return self.data.similar(product_id, limit)
+
+
+similarity_index = SimilarityIndex()
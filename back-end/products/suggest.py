@@ -0,0 +1,382 @@
+"""
+Sugerencias de búsqueda mientras se escribe (/api/products/suggest/?q=).
+
+Índice de prefijos en memoria con títulos de productos disponibles, categorías y
+términos populares, ponderados por views_count. Se construye en la primera consulta,
+se actualiza de forma incremental con los signals de Product y Category (ver
+products/signals.py) y se reconstruye completo cada PRODUCT_SUGGEST_REBUILD_SECONDS,
+en un hilo aparte, para incorporar cambios hechos por otros procesos.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+MIN_PREFIX_LENGTH = 2
+MIN_TERM_LENGTH = 3
+STOPWORDS = {
+    'con', 'del', 'las', 'los', 'para', 'por', 'una', 'uno', 'unos', 'unas', 'sin', 'muy', 'mas', 'que',
+}
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Minúsculas y sin tildes, para que 'calculo' encuentre 'Cálculo'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return WORD_RE.findall(normalize(text))
+
+
+def index_terms(text):
+    """Palabras de un título que se ofrecen como términos de búsqueda"""
+    return {
+        word for word in tokenize(text)
+        if len(word) >= MIN_TERM_LENGTH and word not in STOPWORDS and not word.isdigit()
+    }
+
+
+class TrieNode:
+    __slots__ = ('children', 'keys', 'ranked')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+        self.ranked = None  # claves por tipo ordenadas por peso; se recalcula al cambiar el nodo
+
+
+class PrefixTrie:
+    """Trie de palabras; cada nodo guarda las claves de las entradas con alguna palabra bajo ese prefijo"""
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def add(self, word, key):
+        node = self.root
+        for ch in word:
+            node = node.children.setdefault(ch, TrieNode())
+            node.keys.add(key)
+            node.ranked = None
+
+    def remove(self, word, key):
+        path = []
+        node = self.root
+        for ch in word:
+            child = node.children.get(ch)
+            if child is None:
+                return
+            path.append((node, ch, child))
+            node = child
+        for parent, ch, child in reversed(path):
+            child.keys.discard(key)
+            child.ranked = None
+            if not child.keys and not child.children:
+                del parent.children[ch]
+
+    def invalidate(self, word):
+        """Descarta los rankings cacheados a lo largo de una palabra (cambió el peso de una clave)"""
+        node = self.root
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return
+            node.ranked = None
+
+    def find(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def ranked(self, prefix, weight):
+        """Claves bajo el prefijo agrupadas por tipo ('p', 'c', 't') y ordenadas por peso descendente"""
+        node = self.find(prefix)
+        if node is None:
+            return {}
+        if node.ranked is None:
+            grouped = {}
+            for key in node.keys:
+                grouped.setdefault(key[0], []).append(key)
+            for keys in grouped.values():
+                keys.sort(key=weight, reverse=True)
+            node.ranked = grouped
+        return node.ranked
+
+
+class SuggestionData:
+    """Contenido del índice: el trie y los pesos. Se reemplaza completo en cada reconstrucción"""
+
+    def __init__(self):
+        self.trie = PrefixTrie()
+        self.products = {}     # id -> (título, peso, id de categoría, palabras)
+        self.categories = {}   # id -> (nombre, palabras)
+        self.category_counts = {}
+        self.term_weights = {}
+
+    @classmethod
+    def load(cls):
+        from .models import Category, Product
+
+        data = cls()
+        for category_id, name in Category.objects.values_list('id', 'name'):
+            data.set_category(category_id, name)
+        products = Product.objects.filter(status='available').values_list(
+            'id', 'title', 'views_count', 'category_id'
+        )
+        for product_id, title, views_count, category_id in products.iterator(chunk_size=2000):
+            data.add_product(product_id, title, views_count, category_id)
+        return data
+
+    def set_product(self, product_id, title, views_count, category_id, available):
+        entry = self.products.get(product_id)
+        if entry is not None and available and entry[0] == title and entry[2] == category_id:
+            weight = 1 + (views_count or 0)
+            if weight != entry[1]:
+                # Solo cambió el peso: se descartan los rankings de sus palabras, sin rehacer el trie
+                self._change_product_weight(product_id, weight)
+            # Sin cambios que afecten el índice (precio, descripción...): los rankings siguen válidos
+            return
+        self.remove_product(product_id)
+        if available:
+            self.add_product(product_id, title, views_count, category_id)
+
+    def add_product(self, product_id, title, views_count, category_id):
+        weight = 1 + (views_count or 0)
+        words = set(tokenize(title))
+        self.products[product_id] = (title, weight, category_id, words)
+        for word in words:
+            self.trie.add(word, ('p', product_id))
+        for term in index_terms(title):
+            if term not in self.term_weights:
+                self.trie.add(term, ('t', term))
+            else:
+                self.trie.invalidate(term)
+            self.term_weights[term] = self.term_weights.get(term, 0) + weight
+        if category_id is not None:
+            self._change_category_count(category_id, 1)
+
+    def remove_product(self, product_id):
+        entry = self.products.pop(product_id, None)
+        if entry is None:
+            return
+        title, weight, category_id, words = entry
+        for word in words:
+            self.trie.remove(word, ('p', product_id))
+        for term in index_terms(title):
+            remaining = self.term_weights.get(term, 0) - weight
+            if remaining > 0:
+                self.term_weights[term] = remaining
+                self.trie.invalidate(term)
+            else:
+                self.term_weights.pop(term, None)
+                self.trie.remove(term, ('t', term))
+        if category_id is not None:
+            self._change_category_count(category_id, -1)
+
+    def _change_product_weight(self, product_id, weight):
+        title, previous, category_id, words = self.products[product_id]
+        self.products[product_id] = (title, weight, category_id, words)
+        for word in words:
+            self.trie.invalidate(word)
+        for term in index_terms(title):
+            self.term_weights[term] = self.term_weights.get(term, 0) + weight - previous
+            self.trie.invalidate(term)
+
+    def _change_category_count(self, category_id, delta):
+        self.category_counts[category_id] = self.category_counts.get(category_id, 0) + delta
+        entry = self.categories.get(category_id)
+        if entry:
+            for word in entry[1]:
+                self.trie.invalidate(word)
+
+    def set_category(self, category_id, name):
+        entry = self.categories.get(category_id)
+        if entry is not None and entry[0] == name:
+            return
+        self.remove_category(category_id)
+        words = set(tokenize(name))
+        self.categories[category_id] = (name, words)
+        for word in words:
+            self.trie.add(word, ('c', category_id))
+
+    def remove_category(self, category_id):
+        entry = self.categories.pop(category_id, None)
+        if entry is None:
+            return
+        for word in entry[1]:
+            self.trie.remove(word, ('c', category_id))
+
+    def weight(self, key):
+        kind, value = key
+        if kind == 'p':
+            return self.products[value][1]
+        if kind == 'c':
+            return self.category_counts.get(value, 0)
+        return self.term_weights.get(value, 0)
+
+
+class SuggestionIndex:
+    """
+    Índice compartido por las peticiones del proceso. Las reconstrucciones leen la base
+    de datos sin tomar el lock y cambian el contenido de una vez; mientras tanto se sigue
+    respondiendo con el anterior. Los cambios recibidos durante una reconstrucción se
+    guardan y se aplican al contenido nuevo antes del cambio.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # una reconstrucción a la vez
+        self._built_at = None
+        self._rebuilding = False
+        self._replay = None  # [(método, argumentos)] recibidos durante una reconstrucción
+        self.data = SuggestionData()
+
+    @property
+    def rebuild_interval(self):
+        return getattr(settings, 'PRODUCT_SUGGEST_REBUILD_SECONDS', 600)
+
+    def is_built(self):
+        return self._built_at is not None
+
+    def ensure_built(self):
+        if self._built_at is None:
+            # Primera consulta del proceso: no hay nada que responder hasta construirlo
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif time.monotonic() - self._built_at > self.rebuild_interval:
+            self.rebuild_in_background()
+
+    def rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._background_rebuild, name='suggest-rebuild', daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error(f"Error reconstruyendo el índice de sugerencias: {str(e)}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+            connection.close()
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Se llama con self._build_lock tomado; la base de datos se lee sin bloquear las consultas
+        with self._lock:
+            self._replay = []
+        try:
+            data = SuggestionData.load()
+            with self._lock:
+                for method, args in self._replay:
+                    getattr(data, method)(*args)
+                self.data = data
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._replay = None
+
+    # --- Actualización incremental (desde signals) ---
+
+    def _apply(self, method, *args):
+        """Aplica un cambio al contenido actual y, si hay una reconstrucción en curso, lo guarda para el nuevo"""
+        with self._lock:
+            if not self.is_built() and self._replay is None:
+                return
+            getattr(self.data, method)(*args)
+            if self._replay is not None:
+                self._replay.append((method, args))
+
+    def update_product(self, product):
+        with self._lock:
+            previous = self.data.products.get(product.pk)
+            views_count = product.views_count
+            if not isinstance(views_count, int):
+                # views_count puede ser una expresión F() sin refrescar: conservar el peso anterior
+                views_count = previous[1] - 1 if previous else 0
+            self._apply(
+                'set_product', product.pk, product.title, views_count, product.category_id,
+                product.status == 'available',
+            )
+
+    def remove_product(self, product_id):
+        self._apply('remove_product', product_id)
+
+    def update_category(self, category):
+        self._apply('set_category', category.pk, category.name)
+
+    def remove_category(self, category_id):
+        self._apply('remove_category', category_id)
+
+    # --- Consulta ---
+
+    def suggest(self, query, limit=5):
+        words = tokenize(query)
+        if not words or len(''.join(words)) < MIN_PREFIX_LENGTH:
+            return {'products': [], 'categories': [], 'terms': []}
+
+        self.ensure_built()
+        with self._lock:
+            data = self.data
+            # Todas las palabras escritas deben coincidir como prefijo en productos y categorías.
+            # Se recorre el ranking de la palabra más selectiva y se filtra por las demás.
+            nodes = [data.trie.find(word) for word in words]
+            ranked, others = {}, []
+            if all(node is not None for node in nodes):
+                anchor = min(range(len(words)), key=lambda i: len(nodes[i].keys))
+                ranked = data.trie.ranked(words[anchor], data.weight)
+                others = [word for i, word in enumerate(words) if i != anchor]
+
+            def matches(entry_words):
+                return all(any(w.startswith(prefix) for w in entry_words) for prefix in others)
+
+            products = []
+            for key in ranked.get('p', ()):
+                if matches(data.products[key[1]][3]):
+                    products.append(key[1])
+                    if len(products) == limit:
+                        break
+            categories = []
+            for key in ranked.get('c', ()):
+                if matches(data.categories[key[1]][1]):
+                    categories.append(key[1])
+                    if len(categories) == limit:
+                        break
+
+            # Los términos completan solo la última palabra escrita
+            typed = ' '.join(words[:-1])
+            terms = [key[1] for key in data.trie.ranked(words[-1], data.weight).get('t', ())[:limit]]
+
+            return {
+                'products': [
+                    {'id': product_id, 'title': data.products[product_id][0]}
+                    for product_id in products
+                ],
+                'categories': [
+                    {'id': category_id, 'name': data.categories[category_id][0]}
+                    for category_id in categories
+                ],
+                'terms': [f'{typed} {term}'.strip() for term in terms],
+            }
+
+
+suggestion_index = SuggestionIndex()
@@ -10,6 +10,11 @@
 # Y añadir la siguiente línea:
 # * * * * * cd /ruta/a/tu/proyecto && /ruta/a/venv/bin/python manage.py review_pending_products
 
+# Alternativamente, un solo proceso continuo revisa con menos de un segundo de latencia
+# y usa varios núcleos durante picos (por ejemplo, inicio de semestre):
+# python manage.py review_pending_products --loop --workers 4 --batch-size 50 --max-runtime 3600
+# Con --max-runtime el proceso termina ordenadamente y el supervisor lo reinicia.
+
 # Para configurar en Windows con Task Scheduler:
 # 1. Crear una tarea programada que ejecute cada minuto:
 # powershell -Command "& 'C:\ruta\a\venv\Scripts\python.exe' 'C:\ruta\a\tu\proyecto\manage.py' review_pending_products"
@@ -0,0 +1,37 @@
+"""
+Utilidades para las pruebas: revisión del plan de las consultas frecuentes.
+"""
+
+import re
+
+from django.db import connection
+
+# Tablas que crecen con el uso: ninguna consulta frecuente debe recorrerlas completas
+LARGE_TABLES = {'products_product', 'products_favorite', 'notifications_notification', 'chat_message'}
+
+SQLITE_ALIAS_RE = re.compile(r'"(\w+)" ([TU]\d+)\b')
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?')
+POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+
+
+def full_table_scans(sql):
+    """
+    Tablas grandes que el plan de la consulta recorre completas (EXPLAIN en PostgreSQL,
+    EXPLAIN QUERY PLAN en SQLite). Recorrer un índice completo en orden sí se acepta.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+            plan = [row[0] for row in cursor.fetchall()]
+            tables = {match.group(1) for line in plan for match in POSTGRES_SCAN_RE.finditer(line)}
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+            aliases = {alias: table for table, alias in SQLITE_ALIAS_RE.findall(sql)}
+            tables = set()
+            for detail in plan:
+                match = SQLITE_SCAN_RE.match(detail)
+                if match and 'USING' not in detail:
+                    name = match.group(1)
+                    tables.add(aliases.get(name, name))
+    return tables & LARGE_TABLES, plan
@@ -0,0 +1,96 @@
+"""
+Escritura concurrente de las imágenes de un producto nuevo.
+
+Los archivos se guardan en el storage desde un pool de hilos (la espera es de E/S, así
+que el tiempo total se acerca al del archivo más lento en lugar de la suma) y las filas
+de ProductImage se insertan después con un solo bulk_create. Los bytes que se escriben
+al mismo tiempo tienen un tope para no cargar en memoria todas las subidas grandes a la vez.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .models import ProductImage
+
+logger = logging.getLogger(__name__)
+
+
+class ImageUploadError(Exception):
+    """Alguna imagen no se pudo guardar; failures: [(nombre del archivo, motivo)]"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__(', '.join(name for name, _ in failures))
+
+
+class ByteBudget:
+    """Semáforo por bytes: bloquea hasta que haya espacio para el archivo (uno más grande que el tope pasa solo)"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size):
+        size = min(size, self.limit)
+        with self._condition:
+            while self.in_use and self.in_use + size > self.limit:
+                self._condition.wait()
+            self.in_use += size
+        return size
+
+    def release(self, size):
+        with self._condition:
+            self.in_use -= size
+            self._condition.notify_all()
+
+
+def _store(image, upload):
+    # FieldFile.save(save=False) genera el nombre con upload_to y escribe en el storage sin tocar la base de datos
+    image.image.save(upload.name, upload, save=False)
+    return image
+
+
+def store_product_images(product, uploads, primary_index=0):
+    """
+    Guarda en el storage las imágenes subidas ({índice: archivo}) y devuelve las
+    ProductImage sin guardar, listas para bulk_create. Si alguna falla se borran las ya
+    escritas y se lanza ImageUploadError con todas las fallas, para que quien llama
+    responda con el detalle en lugar de crear el producto sin esas imágenes.
+    """
+    workers = getattr(settings, 'PRODUCT_IMAGE_UPLOAD_WORKERS', 4)
+    budget = ByteBudget(getattr(settings, 'PRODUCT_IMAGE_UPLOAD_MAX_INFLIGHT_BYTES', 32 * 1024 * 1024))
+    stored, failures = [], []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(uploads) or 1))) as pool:
+        futures = []
+        for index, upload in sorted(uploads.items()):
+            image = ProductImage(product=product, is_primary=(index == primary_index))
+            reserved = budget.acquire(upload.size or 0)
+            future = pool.submit(_store, image, upload)
+            future.add_done_callback(lambda _, reserved=reserved: budget.release(reserved))
+            futures.append((upload, future))
+
+        for upload, future in futures:
+            try:
+                stored.append(future.result())
+            except Exception as e:
+                logger.error(f'Error al subir imagen {upload.name}: {e}')
+                failures.append((upload.name, str(e)))
+
+    if failures:
+        delete_stored_images(stored)
+        raise ImageUploadError(failures)
+    return stored
+
+
+def delete_stored_images(images):
+    """Borra del storage los archivos ya escritos cuando la creación del producto se revierte"""
+    for image in images:
+        try:
+            image.image.delete(save=False)
+        except Exception as e:
+            logger.error(f'Error eliminando imagen {image.image.name}: {e}')
@@ -0,0 +1,171 @@
+"""
+Contador de vistas con buffer en memoria.
+
+Cada visita suma 1 en memoria del proceso y responde de inmediato con un valor
+aproximado (último valor persistido + visitas pendientes). Cada
+PRODUCT_VIEWS_FLUSH_INTERVAL segundos, o al acumular PRODUCT_VIEWS_FLUSH_MAX_PENDING
+productos pendientes, se persisten todas con un único UPDATE ... CASE, sin signals, que también suma
+las visitas a la popularidad (products.popularity), y se evalúan los hitos de vistas para notificar a los vendedores.
+
+El vaciado por tiempo lo hace un hilo de cada proceso (iniciado con la primera visita),
+así que las visitas no esperan a la siguiente visita para guardarse. Con
+PRODUCT_VIEWS_FLUSH_IN_BACKGROUND=False solo se vacía al visitar o con flush(), por
+ejemplo en pruebas.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+
+from .models import Product
+from .popularity import WEIGHTS, add_score, event_score
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # id -> visitas aún no persistidas
+        self._known = {}    # id -> (id del vendedor, views_count persistido)
+        self._last_flush = time.monotonic()
+        self._timer_pid = None  # proceso en que corre el hilo de vaciado (no sobrevive a un fork)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'PRODUCT_VIEWS_FLUSH_INTERVAL', 10)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'PRODUCT_VIEWS_FLUSH_MAX_PENDING', 500)
+
+    @property
+    def flush_in_background(self):
+        return getattr(settings, 'PRODUCT_VIEWS_FLUSH_IN_BACKGROUND', True)
+
+    def _product_info(self, product_id):
+        with self._lock:
+            info = self._known.get(product_id)
+        if info is None:
+            # La consulta va fuera del lock; si otro hilo la hizo a la vez, se conserva la primera
+            info = Product.objects.values_list('seller_id', 'views_count').get(pk=product_id)
+            with self._lock:
+                info = self._known.setdefault(product_id, tuple(info))
+        return info
+
+    def _ensure_timer(self):
+        """Inicia el hilo de vaciado de este proceso. Se llama con self._lock tomado"""
+        if self._timer_pid == os.getpid() or not self.flush_in_background:
+            return
+        self._timer_pid = os.getpid()
+        threading.Thread(target=self._run_timer, name='view-counter-flush', daemon=True).start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(max(self.flush_interval, 0.01))
+            with self._lock:
+                due = bool(self._pending) and self.flush_in_background
+            if not due:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error en el vaciado periódico de vistas: {str(e)}")
+            finally:
+                # La conexión de este hilo no se reutiliza hasta el próximo vaciado
+                connection.close()
+
+    def increment(self, product_id, user=None):
+        """
+        Registra una vista (salvo si la hace el propio vendedor) y devuelve el conteo aproximado.
+        Lanza Product.DoesNotExist si el producto no existe.
+        """
+        seller_id, persisted = self._product_info(product_id)
+        is_owner = user is not None and user.is_authenticated and user.pk == seller_id
+
+        with self._lock:
+            self._ensure_timer()
+            if not is_owner:
+                self._pending[product_id] = self._pending.get(product_id, 0) + 1
+            views_count = persisted + self._pending.get(product_id, 0)
+            should_flush = len(self._pending) >= self.max_pending or (
+                # Con el hilo de vaciado, las peticiones solo vacían si se acumuló demasiado
+                not self.flush_in_background
+                and time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if should_flush:
+            self.flush()
+        return views_count
+
+    def flush(self):
+        """Persiste las visitas pendientes con un solo UPDATE y notifica los hitos cruzados"""
+        from notifications.signals import notify_view_milestones
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            # UPDATE y lectura en la misma transacción: las filas quedan bloqueadas hasta el
+            # commit, así que los valores leídos son exactamente los que dejó este UPDATE
+            # (otro proceso vaciando a la vez no se mezcla) y los hitos no se repiten ni se pierden
+            with transaction.atomic():
+                self._apply(pending)
+                updated = list(
+                    Product.objects.filter(pk__in=pending).values_list('id', 'seller_id', 'title', 'views_count')
+                )
+        except Exception as e:
+            logger.error(f"Error al guardar el contador de vistas: {str(e)}")
+            # Devolver las visitas al buffer para el próximo intento
+            with self._lock:
+                for product_id, delta in pending.items():
+                    self._pending[product_id] = self._pending.get(product_id, 0) + delta
+            return 0
+
+        known = {}
+        for product_id, seller_id, title, views_count in updated:
+            known[product_id] = (seller_id, views_count)
+            notify_view_milestones(product_id, seller_id, title, views_count - pending[product_id], views_count)
+        with self._lock:
+            # Solo se conservan los productos recién vaciados; el resto se vuelve a leer si se visita
+            self._known = known
+        return len(pending)
+
+    @staticmethod
+    def _apply(pending):
+        Product.objects.filter(pk__in=pending).update(
+            views_count=F('views_count') + Case(
+                *[When(pk=product_id, then=Value(delta)) for product_id, delta in pending.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            popularity_score=add_score(Case(
+                *[
+                    When(pk=product_id, then=Value(event_score(WEIGHTS['view'] * delta)))
+                    for product_id, delta in pending.items()
+                ],
+                output_field=FloatField(),
+            )),
+        )
+
+
+view_counter = ViewCounter()
+
+
+def _flush_at_exit():
+    try:
+        view_counter.flush()
+    except Exception as e:
+        logger.warning(f"No se pudieron guardar las vistas pendientes al terminar: {str(e)}")
+
+
+atexit.register(_flush_at_exit)
@@ -1,17 +1,38 @@
-from rest_framework import viewsets, status, permissions, filters
+from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from django.core.cache import cache
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.db.models.functions import Substr
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils import timezone
 from datetime import timedelta
-from decimal import Decimal
-from .models import Category, Product, Favorite
-from .serializers import CategorySerializer, ProductSerializer, ProductDetailSerializer, FavoriteSerializer
-from .filters import ProductFilter
+from .bulk import apply_bulk_action
+from .category_list import category_list_cache
+from .cache import (
+    CATALOG, WEEKLY_OFFERS, bump_version, conditional_catalog_response, get_or_build, versioned_key,
+)
+from .models import Category, ModerationRecord, Product, ProductImage, Favorite
+from .serializers import (
+    CategorySerializer, ProductBulkActionSerializer, ProductCardSerializer, ProductSerializer,
+    ProductDetailSerializer, FavoriteSerializer,
+)
+from .facets import PRICE_BUCKETS_PARAM, compute_facets, get_filter_conditions, parse_price_buckets
+from .exports import export_response
+from .filters import ModerationExportFilter, ProductExportFilter, ProductFilter
 from .pagination import CustomPageNumberPagination
+from .search import ProductOrderingFilter, ProductSearchFilter
+from .similar import similarity_index
+from .suggest import suggestion_index
+from .renditions import schedule_renditions
+from .uploads import ImageUploadError, delete_stored_images, store_product_images
+from .view_counter import view_counter
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -24,38 +45,49 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
     def list(self, request, *args, **kwargs):
+        """
+        Categorías con sus productos disponibles, desde la copia en memoria del proceso
+        (ver products/category_list.py); 304 si el cliente ya tiene el mismo contenido.
+        """
         try:
-            # Verificar si hay categorías
-            categories = self.get_queryset()
-            count = categories.count()
-            
-            if count == 0:
-                return Response(
-                    {'error': 'No categories found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-                
-            # Continuar con el comportamiento normal
-            response = super().list(request, *args, **kwargs)
-            
-            return response
+            entry = category_list_cache.get()
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        if entry is None:
+            return Response(
+                {'error': 'No categories found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        body, etag = entry
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        # El navegador puede guardar la respuesta pero debe revalidarla en cada uso
+        patch_cache_control(response, no_cache=True)
+        return response
+
+# Descuento mínimo (%) para aparecer en las ofertas semanales
+WEEKLY_OFFERS_MIN_DISCOUNT = 35
 
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['title', 'description']
-    ordering_fields = ['price', 'created_at', 'views_count']
+    ordering_fields = ['price', 'created_at', 'views_count', 'discount_pct', 'popularity_score']
     ordering = ['-created_at']
     pagination_class = CustomPageNumberPagination
     
+    # Acciones que devuelven tarjetas (ProductCardSerializer) con ?fields= / ?expand=
+    card_actions = ('list', 'my_products', 'similar')
+    
     def get_serializer_context(self):
         """
         Asegurar que el request se pase al contexto del serializer
@@ -63,20 +95,94 @@ class ProductViewSet(viewsets.ModelViewSet):
         """
         context = super().get_serializer_context()
         context['request'] = self.request
+        context['fields'] = self.get_list_param('fields')
+        context['expand'] = self.get_list_param('expand')
+        if self.action == 'my_products':
+            # El formulario de edición usa la descripción completa
+            context['expand'].add('description')
         return context
     
+    def get_list_param(self, name):
+        value = self.request.query_params.get(name, '') if self.request else ''
+        return {item.strip() for item in value.split(',') if item.strip()}
+    
+    def get_queryset(self):
+        """
+        Carga en consultas fijas todo lo que usa ProductSerializer: vendedor con perfil
+        (incluye su reputación), categoría, imágenes y si el usuario lo tiene en favoritos.
+        """
+        if self.action in self.card_actions:
+            return self.get_card_queryset()
+        
+        queryset = Product.objects.select_related('seller__profile', 'category').prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id'))
+        )
+        
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                favorited_by_user=Exists(Favorite.objects.filter(user=user, product=OuterRef('pk')))
+            )
+        return queryset
+    
+    def get_card_queryset(self):
+        """
+        Queryset para tarjetas: carga solo las columnas de los campos pedidos, calcula el
+        extracto de la descripción en SQL y omite las imágenes o favoritos si no se piden.
+        """
+        context = self.get_serializer_context()
+        sources = ProductCardSerializer.FIELD_SOURCES
+        fields = (context['fields'] & set(sources)) or set(sources)
+        expand = context['expand']
+        
+        if 'seller' in fields and 'seller' in expand:
+            # Vendedor completo con perfil: mismas cargas que ProductSerializer
+            queryset = Product.objects.select_related('seller__profile', 'category')
+        else:
+            # Siempre se cargan los campos de orden usados por la paginación por cursor
+            only = {'id', 'created_at', 'price', 'views_count', 'discount_pct', 'popularity_score'}
+            for name in fields:
+                only.update(sources[name])
+            if 'description' in fields and 'description' in expand:
+                only.add('description')
+            related = {source.split('__')[0] for source in only if '__' in source}
+            queryset = Product.objects.select_related(*related).only(*only)
+        
+        if 'description' in fields and 'description' not in expand:
+            queryset = queryset.annotate(
+                description_excerpt=Substr('description', 1, ProductCardSerializer.DESCRIPTION_EXCERPT_LENGTH + 1)
+            )
+        if fields & {'images', 'main_image_url'}:
+            queryset = queryset.prefetch_related(
+                Prefetch('images', queryset=ProductImage.objects.only('id', 'product_id', 'image', 'is_primary', 'renditions').order_by('id'))
+            )
+        
+        user = self.request.user
+        if 'is_favorite' in fields and user.is_authenticated:
+            queryset = queryset.annotate(
+                favorited_by_user=Exists(Favorite.objects.filter(user=user, product=OuterRef('pk')))
+            )
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ProductDetailSerializer
+        if self.action in self.card_actions:
+            return ProductCardSerializer
         return ProductSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'weekly_offers', 'debug_products']:
+        if self.action in ['list', 'retrieve', 'weekly_offers', 'debug_products', 'suggest', 'facets', 'similar']:
             permission_classes = [permissions.AllowAny]
+        elif self.action in self.export_actions:
+            permission_classes = [permissions.IsAdminUser]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     def retrieve(self, request, *args, **kwargs):
+        return conditional_catalog_response(request, lambda: self.retrieve_product(request, *args, **kwargs))
+
+    def retrieve_product(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -84,20 +190,117 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[permissions.AllowAny])
     def increment_view(self, request, pk=None):
         """
-        Incrementa views_count solo para usuarios no propietarios
+        Incrementa views_count solo para usuarios no propietarios.
+        La vista se acumula en memoria y se guarda en lote (ver products/view_counter.py);
+        el conteo devuelto es aproximado.
         """
-        instance = self.get_object()
-        is_owner = request.user.is_authenticated and instance.seller == request.user
-        if not is_owner:
-            instance.views_count = models.F('views_count') + 1
-            instance.save(update_fields=['views_count'])
-            # Refresh from DB to get integer value
-            instance.refresh_from_db(fields=['views_count'])
-        return Response({'views_count': instance.views_count})
+        try:
+            views_count = view_counter.increment(int(pk), request.user)
+        except (ValueError, Product.DoesNotExist):
+            raise NotFound()
+        return Response({'views_count': views_count})
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def suggest(self, request):
+        """
+        Sugerencias para autocompletar la búsqueda: títulos, categorías y términos populares.
+        Se responde desde el índice en memoria, sin consultar la base de datos.
+        """
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 5)), 1), 10)
+        except ValueError:
+            limit = 5
+        suggestions = suggestion_index.suggest(query, limit)
+        return Response({'query': query, **suggestions})
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def facets(self, request):
+        """
+        Conteos por categoría, condición, estado y rango de precio para los mismos filtros
+        y búsqueda del listado, calculados en una sola consulta agregada (ver products/facets.py).
+        """
+        return conditional_catalog_response(request, lambda: self.compute_facets(request))
+
+    def compute_facets(self, request):
+        bounds = parse_price_buckets(request.query_params.get(PRICE_BUCKETS_PARAM))
+        conditions = get_filter_conditions(request)
+        queryset = ProductSearchFilter().filter_queryset(request, Product.objects.all(), self)
+        return Response(compute_facets(self.filter_visible(queryset), conditions, bounds))
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Marca como disponibles o no disponibles, elimina o cambia el precio de varios
+        productos propios en una sola solicitud: {"action": ..., "ids": [...], "price"|"percent": ...}.
+        """
+        serializer = ProductBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = apply_bulk_action(
+            request.user, data['action'], data['ids'], data.get('price'), data.get('percent')
+        )
+        return Response(result)
+    
+    # Exportaciones solo para administradores (ver products/exports.py)
+    export_actions = ('export', 'moderation_export')
+    EXPORT_COLUMNS = [
+        ('id', 'id'), ('title', 'title'), ('price', 'price'), ('original_price', 'original_price'),
+        ('discount_pct', 'discount_pct'), ('status', 'status'), ('condition', 'condition'),
+        ('category_id', 'category_id'), ('category', 'category__name'),
+        ('seller_id', 'seller_id'), ('seller_email', 'seller__email'),
+        ('views_count', 'views_count'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]
+    MODERATION_EXPORT_COLUMNS = [
+        ('id', 'id'), ('product_id', 'product_id'), ('product_title', 'product_title'),
+        ('category_id', 'product__category_id'), ('seller_id', 'seller_id'), ('seller_email', 'seller__email'),
+        ('approved', 'approved'), ('reason', 'reason'), ('review_depth', 'review_depth'),
+        ('risk_score', 'risk_score'), ('created_at', 'created_at'),
+    ]
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Catálogo completo en NDJSON o CSV, en streaming (?output=, ?created_after=, ?status=, ?category=)"""
+        queryset = Product.objects.order_by('pk')
+        return export_response(request, queryset, self.EXPORT_COLUMNS, ProductExportFilter, 'productos')
+
+    @action(detail=False, methods=['get'], url_path='moderation/export')
+    def moderation_export(self, request):
+        """Historial de revisiones en NDJSON o CSV, en streaming (?output=, ?created_after=, ?approved=, ?category=)"""
+        queryset = ModerationRecord.objects.order_by('pk')
+        return export_response(
+            request, queryset, self.MODERATION_EXPORT_COLUMNS, ModerationExportFilter, 'moderacion'
+        )
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def similar(self, request, pk=None):
+        """
+        Productos disponibles parecidos por título, descripción y categoría (ver products/similar.py),
+        como tarjetas. Los ids se cachean por producto con la versión del catálogo.
+        """
+        return conditional_catalog_response(request, lambda: self.similar_products(request, pk))
+
+    def similar_products(self, request, pk):
+        try:
+            product_id = int(pk)
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 24)
+        except ValueError:
+            raise NotFound()
+        if not self.filter_visible(Product.objects.filter(pk=product_id)).exists():
+            raise NotFound()
+
+        ids = get_or_build(
+            versioned_key(CATALOG, 'similar', product_id, limit),
+            lambda: similarity_index.similar(product_id, limit),
+            settings.CATALOG_CACHE_TIMEOUT,
+        )
+        products = {product.pk: product for product in self.get_queryset().filter(pk__in=ids)}
+        serializer = self.get_serializer([products[i] for i in ids if i in products], many=True)
+        return Response({'results': serializer.data})
     
     @action(detail=False, methods=['get'])
     def my_products(self, request):
-        queryset = self.queryset.filter(seller=request.user)
+        queryset = self.get_queryset().filter(seller=request.user)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -143,49 +346,29 @@ class ProductViewSet(viewsets.ModelViewSet):
     def weekly_offers(self, request):
         """
         Devuelve productos con ofertas semanales (descuentos de 35% o más)
-        publicados en los últimos 7 días, limitado a 10 ofertas.
+        cuyo precio bajó en los últimos 7 días, limitado a 10 ofertas.
+        
+        El filtro y el orden usan las columnas discount_pct y discounted_at, mantenidas al
+        guardar y con índice propio. El resultado se guarda en una caché versionada que se
+        invalida cuando cambia el precio o el estado de un producto (ver products/signals.py);
+        is_favorite se agrega por usuario.
         """
         try:
-            # Fecha de hace 7 días para ofertas semanales
-            seven_days_ago = timezone.now() - timedelta(days=7)
-            
-            # Filtrar todos los productos con descuento (original_price > price)
-            queryset = Product.objects.filter(
-                status='available',
-                original_price__gt=models.F('price')
-            ).select_related('seller', 'category')  # Optimizar consultas
-            
-            # Lista para almacenar productos con su porcentaje de descuento
-            offers_with_discount = []
-            
-            for product in queryset:
-                if product.original_price and product.price:
-                    # Calcular porcentaje de descuento
-                    original = Decimal(str(product.original_price))
-                    current = Decimal(str(product.price))
-                    
-                    if original > current:  # Solo si hay descuento
-                        discount_percentage = ((original - current) / original) * 100
-                        
-                        # Solo incluir si el descuento es >= 35%
-                        if discount_percentage >= 35:
-                            offers_with_discount.append({
-                                'product': product,
-                                'discount_percentage': round(discount_percentage, 1)
-                            })
-            
-            # Ordenar por porcentaje de descuento (mayor descuento primero)
-            offers_with_discount.sort(key=lambda x: x['discount_percentage'], reverse=True)
-            
-            # Limitar a máximo 10 ofertas
-            offers_with_discount = offers_with_discount[:10]
-            
-            # Crear respuesta con productos y porcentajes de descuento
-            offers_data = []
-            for offer in offers_with_discount:
-                product_data = ProductSerializer(offer['product']).data
-                product_data['discount_percentage'] = offer['discount_percentage']
-                offers_data.append(product_data)
+            cache_key = versioned_key(WEEKLY_OFFERS, request.scheme, request.get_host())
+            offers_data = cache.get(cache_key)
+            if offers_data is None:
+                offers_data = self.build_weekly_offers(request)
+                cache.set(cache_key, offers_data, settings.WEEKLY_OFFERS_CACHE_TIMEOUT)
+            
+            # Copia por respuesta para no modificar lo guardado en la caché local
+            offers_data = [dict(offer) for offer in offers_data]
+            if request.user.is_authenticated and offers_data:
+                favorite_ids = set(Favorite.objects.filter(
+                    user=request.user,
+                    product_id__in=[offer['id'] for offer in offers_data]
+                ).values_list('product_id', flat=True))
+                for offer in offers_data:
+                    offer['is_favorite'] = offer['id'] in favorite_ids
             
             return Response(offers_data)
             
@@ -195,6 +378,26 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def build_weekly_offers(self, request):
+        seven_days_ago = timezone.now() - timedelta(days=7)
+        
+        queryset = Product.objects.filter(
+            status='available',
+            discount_pct__gte=WEEKLY_OFFERS_MIN_DISCOUNT,
+            discounted_at__gte=seven_days_ago,
+        ).annotate(
+            # Se serializa sin usuario; is_favorite se agrega en cada respuesta
+            favorited_by_user=models.Value(False, output_field=models.BooleanField()),
+        ).select_related('seller__profile', 'category').prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id'))
+        ).order_by('-discount_pct', '-discounted_at')[:10]
+        
+        offers = list(queryset)
+        offers_data = ProductSerializer(offers, many=True, context={'request': request}).data
+        for product, product_data in zip(offers, offers_data):
+            product_data['discount_percentage'] = round(float(product.discount_pct), 1)
+        return [dict(product_data) for product_data in offers_data]
+
     def create(self, request, *args, **kwargs):
         try:
             import logging
@@ -202,7 +405,6 @@ class ProductViewSet(viewsets.ModelViewSet):
             logger.info('--- INICIO CREACIÓN DE PRODUCTO ---')
             logger.info(f'Usuario: {request.user} | Email: {getattr(request.user, "email", None)}')
             logger.info(f'Archivos recibidos: {list(request.FILES.keys())}')
-            logger.info(f'Datos recibidos: {dict(request.data)}')
             # Verificación automática para usuarios UOH (failsafe)
             is_uoh_email = request.user.email.endswith('@pregrado.uoh.cl') or request.user.email.endswith('@uoh.cl')
             
@@ -224,40 +426,37 @@ class ProductViewSet(viewsets.ModelViewSet):
                 logger.error(f'Errores de validación: {serializer.errors}')
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            # Guardar el producto con estado inicial "En revisión" y establecer precio original
-            product = serializer.save(status='pending', original_price=serializer.validated_data['price'])
-
-            # Procesar múltiples imágenes
-            from .models import ProductImage
-            image_keys = [key for key in request.FILES.keys() if key.startswith('images[')]
-            logger.info(f'Procesando imágenes: {image_keys}')
-
-            if image_keys:
-                primary_image_index = request.data.get('primary_image_index', '0')
-                try:
-                    primary_index = int(primary_image_index)
-                except (ValueError, TypeError):
-                    primary_index = 0
-
-                for key in image_keys:
-                    image_file = request.FILES[key]
-                    logger.info(f'[DEBUG] Tipo de image_file recibido en vista: {type(image_file)}, name={getattr(image_file, "name", None)}, size={getattr(image_file, "size", None)}')
-                    if not hasattr(image_file, 'read'):
-                        logger.warning(f'[WARNING] El archivo recibido en {key} no es un archivo subido real. Puede que la imagen no se suba correctamente.')
+            # Imágenes indexadas como images[0], images[1], ...
+            uploads = {}
+            for key in request.FILES.keys():
+                if key.startswith('images['):
                     try:
-                        index = int(key.split('[')[1].split(']')[0])
-                        is_primary = (index == primary_index)
-                        logger.info(f'Subiendo imagen {key}: {image_file.name} (primary={is_primary})')
+                        uploads[int(key.split('[')[1].split(']')[0])] = request.FILES[key]
+                    except ValueError:
+                        logger.warning(f'Clave de imagen inválida: {key}')
+            try:
+                primary_index = int(request.data.get('primary_image_index', '0'))
+            except (ValueError, TypeError):
+                primary_index = 0
 
-                        image = ProductImage.objects.create(
-                            product=product,
-                            image=image_file,
-                            is_primary=is_primary
-                        )
-                        image.save()
-                        logger.info(f'Imagen subida correctamente: {image.image.url}')
-                    except Exception as e:
-                        logger.error(f'Error al subir imagen {key}: {e}')
+            # Producto e imágenes en una sola transacción: los archivos se escriben en paralelo
+            # y las filas se insertan juntas; si algo falla se borran los archivos ya escritos
+            images = []
+            try:
+                with transaction.atomic():
+                    # Guardar el producto con estado inicial "En revisión" y establecer precio original
+                    product = serializer.save(status='pending', original_price=serializer.validated_data['price'])
+                    if uploads:
+                        images = store_product_images(product, uploads, primary_index)
+                        ProductImage.objects.bulk_create(images)
+                        # bulk_create no dispara post_save: las versiones reducidas se encolan aquí
+                        schedule_renditions(image.pk for image in images)
+                    # bulk_create no dispara signals: invalidar el catálogo (al confirmar la transacción)
+                    bump_version(CATALOG)
+            except Exception:
+                delete_stored_images(images)
+                raise
+            logger.info(f'Producto #{product.id} creado con {len(images)} imágenes')
 
             # Verificar si el producto pasó la moderación (atributo agregado por el signal)
             if hasattr(product, '_moderation_passed') and not product._moderation_passed:
@@ -275,6 +474,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             headers = self.get_success_headers(serializer.data)
             logger.info('--- PRODUCTO CREADO EXITOSAMENTE ---')
             return Response(updated_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        except ImageUploadError as e:
+            return Response(
+                {
+                    "error": "No se pudieron guardar todas las imágenes. El producto no fue creado.",
+                    "failed_images": [{"name": name, "error": error} for name, error in e.failures],
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -282,28 +489,13 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def list(self, request, *args, **kwargs):
+        # Los anónimos comparten respuestas cacheadas hasta el próximo cambio del catálogo;
+        # los clientes que ya tienen la versión actual reciben 304
+        return conditional_catalog_response(request, lambda: self.list_products(request, *args, **kwargs))
+
+    def list_products(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            
-            # Filtrar productos según el estado y el rol del usuario
-            if request.user.is_authenticated:
-                if request.user.is_staff:
-                    # Los administradores pueden ver todos los productos
-                    pass
-                else:
-                    # Usuarios normales autenticados:
-                    # 1. Ver sus propios productos independientemente del estado
-                    # 2. Ver productos marcados como disponible o no disponible (pero no en revisión) de otros usuarios
-                    queryset = queryset.filter(
-                        models.Q(seller=request.user) |  # Sus propios productos
-                        (
-                            ~models.Q(seller=request.user) &  # Productos de otros usuarios
-                            ~models.Q(status='pending')        # Que no estén en revisión
-                        )
-                    )
-            else:
-                # Usuarios no autenticados solo ven productos disponibles o no disponibles (manualmente)
-                queryset = queryset.exclude(status='pending')
+            queryset = self.filter_visible(self.filter_queryset(self.get_queryset()))
                 
             page = self.paginate_queryset(queryset)
             if page is not None:
@@ -312,12 +504,32 @@ class ProductViewSet(viewsets.ModelViewSet):
             
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
+        except NotFound:
+            # Página o cursor inválido
+            raise
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def filter_visible(self, queryset):
+        """Filtrar productos según el estado y el rol del usuario"""
+        user = self.request.user
+        if user.is_authenticated:
+            if user.is_staff:
+                # Los administradores pueden ver todos los productos
+                return queryset
+            # Usuarios normales autenticados:
+            # 1. Ver sus propios productos independientemente del estado
+            # 2. Ver productos marcados como disponible o no disponible (pero no en revisión) de otros usuarios
+            return queryset.filter(
+                models.Q(seller=user) |  # Sus propios productos
+                models.Q(status__in=Product.PUBLIC_STATUSES)  # De otros, si no están en revisión
+            )
+        # Usuarios no autenticados solo ven productos disponibles o no disponibles (manualmente)
+        return queryset.filter(status__in=Product.PUBLIC_STATUSES)
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -328,31 +540,12 @@ class ProductViewSet(viewsets.ModelViewSet):
                     {"detail": "No tienes permiso para eliminar este producto."},
                     status=status.HTTP_403_FORBIDDEN
                 )
-              # Primero eliminar las imágenes asociadas de manera segura
-            try:
-                from .models import ProductImage
-                ProductImage.objects.filter(product=instance).delete()
-            except Exception:
-                pass
-              # Eliminar los favoritos asociados de manera segura
-            try:
-                Favorite.objects.filter(product=instance).delete()
-            except Exception:
-                pass  # Ignorar errores al eliminar favoritos
-            
-            # Usar eliminación directa para evitar problemas con el colector de relaciones
-            # Esto evita que Django busque relaciones con tablas inexistentes
-            product_id = instance.id
-            from django.db import connection
-            cursor = connection.cursor()
-            
-            # Eliminar primero cualquier registro en otras tablas relacionadas
-            # que podrían estar causando problemas con la eliminación en cascada
-            
-            # Finalmente, eliminar el producto directamente con SQL
-            cursor.execute("DELETE FROM products_product WHERE id = %s", [product_id])
-            connection.commit()
-            
+
+            # El ORM aplica las cascadas (imágenes, favoritos, conversaciones, historial de
+            # precios) y el SET_NULL de los registros de moderación; los signals de post_delete
+            # limpian los índices en memoria, la búsqueda, los contadores y la caché
+            with transaction.atomic():
+                instance.delete()
             
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
@@ -379,6 +572,12 @@ class ProductViewSet(viewsets.ModelViewSet):
             if not serializer.is_valid():
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
+            # Campos que realmente cambian, para la re-revisión agrupada
+            changed_fields = [
+                field for field, value in serializer.validated_data.items()
+                if getattr(instance, field, None) != value
+            ]
+            
             # Verificar si el precio ha cambiado para manejar el precio original
             new_price = serializer.validated_data.get('price')
             if new_price is not None and new_price != instance.price:
@@ -414,6 +613,7 @@ class ProductViewSet(viewsets.ModelViewSet):
                 new_images.append(single_image)
             
             
+            new_image_ids = []
             if new_images:
                 try:
                     from .models import validate_image
@@ -438,90 +638,37 @@ class ProductViewSet(viewsets.ModelViewSet):
                         
                         # La primera imagen nueva será primaria si no hay imagen primaria existente
                         is_primary = not has_primary and i == 0
-                          # Crear nueva imagen
                         image = ProductImage.objects.create(
                             product=instance,
                             image=image_file,
                             is_primary=is_primary
                         )
-                        image.save()
-                        
+                        new_image_ids.append(image.id)
                         
-                        # Verificar que la imagen realmente se guardó
-                        total_images = ProductImage.objects.filter(product=instance).count()
-                          # Después de crear la primera imagen primaria, las siguientes no lo serán
+                        # Después de crear la primera imagen primaria, las siguientes no lo serán
                         if is_primary:
                             has_primary = True
-                    
-                    # ¡NUEVA FUNCIONALIDAD! Moderar imágenes nuevas con IA
-                    
-                    # Analizar cada imagen nueva con el sistema de IA
-                    inappropriate_images = []
-                    for i, image_file in enumerate(new_images):
-                        try:
-                            # Obtener la imagen recién creada para moderar
-                            image_instance = ProductImage.objects.filter(product=instance).order_by('-id')[i]
-                            image_path = image_instance.image.path
-
-                            # Usar el sistema de IA mejorado para moderar (igual que en creación)
-                            from .intelligent_moderator import moderate_product_with_ai
-                            is_approved, rejection_reason = moderate_product_with_ai(instance)
-                            if not is_approved:
-                                inappropriate_images.append({
-                                    'image_name': image_file.name,
-                                    'reason': rejection_reason,
-                                    'confidence': 1.0
-                                })
-                        except Exception as mod_err:
-                            inappropriate_images.append({
-                                'image_name': image_file.name,
-                                'reason': f'Error en análisis de seguridad: {str(mod_err)}',
-                                'confidence': 1.0
-                            })
-                    
-                    # Si se detectaron imágenes inapropiadas, cambiar estado a pendiente y notificar
-                    if inappropriate_images:
-                        # Cambiar estado del producto a pendiente para revisión
-                        instance.status = 'pending'
-                        instance.save()
-                        
-                        # Programar revisión en 30 segundos
-                        from django.utils import timezone
-                        import datetime
-                        review_time = timezone.now() + datetime.timedelta(seconds=30)
-                        Product.objects.filter(pk=instance.pk).update(review_scheduled_at=review_time)
-                        
-                        
-                        # Crear mensaje detallado para el usuario
-                        image_names = [img['image_name'] for img in inappropriate_images]
-                        error_details = []
-                        for img in inappropriate_images:
-                            error_details.append(f"• {img['image_name']}: {img['reason']}")
-                        
-                        error_message = (
-                            f"⚠️ No podemos actualizar tu producto en este momento.\n\n"
-                            f"Nuestro sistema de seguridad ha detectado contenido que podría ser inapropiado "
-                            f"en las siguientes imágenes:\n\n"
-                            + "\n".join(error_details) +
-                            f"\n\n📋 Tu producto ha sido puesto en revisión y será analizado en los próximos 30 segundos. "
-                            f"Si el contenido es apropiado, se publicará automáticamente. "
-                            f"Si no, puedes editarlo y volver a intentarlo."
-                        )
-                        
-                        return Response(
-                            {"detail": error_message},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    else:
-                        # Si no hay imágenes inapropiadas, continuar con la actualización
-                        instance.status = 'available'
-                        instance.save()
                 except Exception as img_err:
                     return Response(
                         {"detail": f"Error al guardar las imágenes: {str(img_err)}"},
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
+            # Las imágenes nuevas se moderan en una re-revisión agrupada: las ediciones
+            # dentro de la ventana de silencio se unen en un solo trabajo pendiente.
+            # Si ya hay una re-revisión pendiente, los cambios de texto también se suman.
+            # Un producto nunca aprobado sigue con su revisión inicial, que analiza todas las imágenes.
+            needs_rereview = new_image_ids or (instance.pending_review_changes and changed_fields)
+            if needs_rereview and instance.status != 'pending':
+                from .review import schedule_rereview
+                schedule_rereview(instance, changed_fields, new_image_ids)
+                
+                updated_serializer = self.get_serializer(instance)
+                data = dict(updated_serializer.data)
+                data['review_status'] = 'pending_rereview'
+                data['pending_review_changes'] = instance.pending_review_changes
+                return Response(data, status=status.HTTP_202_ACCEPTED)
+            
             # Obtener los datos actualizados
             instance.refresh_from_db()
             updated_serializer = self.get_serializer(instance)
@@ -721,9 +868,16 @@ def debug_create_test(request):
 class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPageNumberPagination
     
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user)
+        # Tarjetas de producto con vendedor, categoría e imágenes precargados
+        products = Product.objects.select_related('seller', 'category').prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id'))
+        ).annotate(favorited_by_user=models.Value(True, output_field=models.BooleanField()))
+        return Favorite.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('product', queryset=products)
+        ).order_by('-created_at', '-id')
     
     @action(detail=True, methods=['delete'])
     def remove(self, request, pk=None):